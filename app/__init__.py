@@ -3,5 +3,13 @@ from . import clients
 from . import session
 from . import server
 from . import events
+from . import routing
 from . import common
 from . import tasks
+from . import credentials
+from . import permissions
+from . import admission
+from . import writer
+from . import resume
+from . import tokens
+from . import workers
@@ -0,0 +1,79 @@
+
+from twisted.internet import defer, reactor, threads
+from typing import Callable, Dict, Tuple
+
+import threading
+import random
+import config
+import time
+import app
+
+slots = defer.DeferredSemaphore(config.LOGIN_CONCURRENCY)
+buckets: Dict[str, Tuple[float, float]] = {}
+lock = threading.Lock()
+
+class LoginRejected(Exception):
+    """The login was not admitted, and the client should retry later"""
+
+def take_token(address: str) -> bool:
+    """Take a login from the token bucket of an ip address"""
+    now = time.monotonic()
+
+    with lock:
+        if len(buckets) > 10000:
+            # Remove buckets, that have been refilled completely
+            refill_time = config.LOGIN_IP_BURST / config.LOGIN_IP_RATE
+
+            for key in [k for k, (_, last) in buckets.items() if now - last > refill_time]:
+                del buckets[key]
+
+        tokens, last = buckets.get(address, (config.LOGIN_IP_BURST, now))
+        tokens = min(config.LOGIN_IP_BURST, tokens + (now - last) * config.LOGIN_IP_RATE)
+
+        if tokens < 1:
+            buckets[address] = (tokens, now)
+            return False
+
+        buckets[address] = (tokens - 1, now)
+        return True
+
+def submit(address: str, func: Callable, *args) -> defer.Deferred:
+    """
+    Run a login on the threadpool, once a login slot is free.
+    Logins are queued on the reactor, so that waiting logins don't occupy any threads.
+    This needs to be called from the reactor thread.
+    """
+    if not take_token(address):
+        app.session.metrics.counter('login.rate_limited').increment()
+        return defer.fail(LoginRejected('Rate limited'))
+
+    if len(slots.waiting) >= config.LOGIN_QUEUE_SIZE:
+        app.session.metrics.counter('login.rejected').increment()
+        return defer.fail(LoginRejected('Login queue is full'))
+
+    def on_timeout(failure):
+        failure.trap(defer.TimeoutError)
+        app.session.metrics.counter('login.rejected').increment()
+        raise LoginRejected('Timed out in login queue')
+
+    def run(_):
+        app.session.metrics.counter('login.admitted').increment()
+        d = threads.deferToThread(func, *args)
+        d.addBoth(release)
+        return d
+
+    d = slots.acquire()
+    d.addTimeout(config.LOGIN_QUEUE_TIMEOUT, reactor)
+    d.addCallbacks(run, on_timeout)
+    return d
+
+def release(result):
+    slots.release()
+    return result
+
+def retry_delay() -> int:
+    """Randomized reconnect delay in milliseconds, to spread out the logins of clients"""
+    return config.RESTART_DELAY + random.randint(0, config.RESTART_JITTER)
+
+app.session.metrics.gauge('login.queue_depth', lambda: len(slots.waiting))
+app.session.metrics.gauge('login.active', lambda: slots.limit - slots.tokens)
@@ -50,10 +50,17 @@ from copy import copy
 
 import config
 import time
-
-def register(packet: RequestPacket) -> Callable:
+import app
+
+def register(packet: RequestPacket, blocking: bool = True) -> Callable:
+    """
+    Register a handler function for a packet.
+    Handlers that don't block, e.g. by accessing the database,
+    may be run on the reactor thread directly.
+    """
     def wrapper(func) -> Callable:
         session.handlers[packet] = func
+        func.blocking = blocking
         return func
 
     return wrapper
@@ -76,7 +83,7 @@ def resolve_channel(channel_name: str, player: Player) -> Optional[Channel]:
     if channel := session.channels.by_name(channel_name):
         return channel
 
-@register(RequestPacket.PONG)
+@register(RequestPacket.PONG, blocking=False)
 def pong(player: Player):
     pass # lol
 
@@ -87,26 +94,33 @@ def exit(player: Player, updating: bool):
 
 @register(RequestPacket.RECEIVE_UPDATES)
 def receive_updates(player: Player, filter: PresenceFilter):
-    player.filter = filter
+    # Players that the client knows about already
+    # The first request is treated as coming from "None"
+    previous = (
+        {p.id for p in session.players if player.receives_updates_from(p)}
+        if player.filter_received else set()
+    )
+
+    session.players.set_filter(player, filter)
 
     if filter.value <= 0:
         # Client set filter to "None"
         # No players will be sent
         return
 
-    # Account for player filter
-    players = (
-        session.players
-        if filter == PresenceFilter.All
-        else player.online_friends
-    )
+    # Only send players that match the new filter
+    players = [
+        p for p in session.players
+        if p.id not in previous
+        and player.receives_updates_from(p)
+    ]
 
     player.enqueue_players(players, stats_only=True)
 
 @register(RequestPacket.PRESENCE_REQUEST)
 def presence_request(player: Player, players: List[int]):
     for id in players:
-        if not (target := session.players.by_id(id)):
+        if not (target := session.players.by_id(id) or app.routing.remote_players.get(id)):
             continue
 
         player.enqueue_presence(target)
@@ -115,10 +129,13 @@ def presence_request(player: Player, players: List[int]):
 def presence_request_all(player: Player):
     player.enqueue_players(session.players)
 
+    if app.routing.remote_players:
+        player.enqueue_players(list(app.routing.remote_players.values()))
+
 @register(RequestPacket.STATS_REQUEST)
 def stats_request(player: Player, players: List[int]):
     for id in players:
-        if not (target := session.players.by_id(id)):
+        if not (target := session.players.by_id(id) or app.routing.remote_players.get(id)):
             continue
 
         player.enqueue_stats(target)
@@ -131,13 +148,14 @@ def change_status(player: Player, status: bStatusUpdate):
     player.status.mods = status.mods
     player.status.mode = status.mode
     player.status.text = status.text
+    player.clear_packet_cache()
 
     player.update_status_cache()
     player.update_activity()
     player.reload_rank()
 
     # (This needs to be done for older clients)
-    session.players.send_stats(player)
+    session.players.queue_stats(player)
 
 @register(RequestPacket.REQUEST_STATUS)
 def request_status(player: Player):
@@ -213,7 +231,8 @@ def send_private_message(sender: Player, message: bMessage):
         officer.call(f'{sender.name} tried to message peppy: "{message.content}"')
         return
 
-    if not (target := session.players.by_name(message.target)):
+    # Messages to players of other nodes go through the same checks
+    if not (target := session.players.by_name(message.target) or app.routing.by_name(message.target)):
         sender.revoke_channel(message.target)
         return
 
@@ -230,7 +249,7 @@ def send_private_message(sender: Player, message: bMessage):
         sender.enqueue_silenced_target(target.name)
         return
 
-    if target.client.friendonly_dms:
+    if target.friendonly_dms:
         if sender.id not in target.friends:
             sender.enqueue_blocked_dms(sender.name)
             return
@@ -294,6 +313,7 @@ def away_message(player: Player, message: bMessage):
     if message.content != "":
         player.logger.info(f'Player was marked as being away: {message.content}')
         player.away_message = message.content
+        app.routing.publish_stats(player)
         player.enqueue_message(
             bMessage(
                 session.bot_player.name,
@@ -307,6 +327,7 @@ def away_message(player: Player, message: bMessage):
 
     player.logger.info('Player is no longer marked as being away.')
     player.away_message = None
+    app.routing.publish_stats(player)
     player.enqueue_message(
         bMessage(
             session.bot_player.name,
@@ -480,6 +501,10 @@ def start_spectating(player: Player, player_id: int):
 
     if not (target := session.players.by_id(player_id)):
         player.logger.warning(f'Failed to start spectating: Player with id "{player_id}" was not found!')
+
+        if app.routing.remote_players.get(player_id):
+            player.enqueue_announcement("This player is connected to another server process and can't be spectated.")
+
         return
 
     if target.id == session.bot_player.id:
@@ -524,8 +549,9 @@ def stop_spectating(player: Player):
     player.spectating.spectator_chat.remove(player)
 
     # Enqueue to others
-    for p in player.spectating.spectators:
-        p.enqueue_fellow_spectator_left(player.id)
+    player.spectating.spectators.broadcast(
+        lambda p: p.enqueue_fellow_spectator_left(player.id)
+    )
 
     # Enqueue to target
     player.spectating.enqueue_spectator_left(player.id)
@@ -535,7 +561,7 @@ def stop_spectating(player: Player):
     player.logger.info(f'Stopped spectating "{player.spectating.name}".')
     player.spectating = None
 
-@register(RequestPacket.CANT_SPECTATE)
+@register(RequestPacket.CANT_SPECTATE, blocking=False)
 def cant_spectate(player: Player):
     if not player.spectating:
         return
@@ -543,33 +569,39 @@ def cant_spectate(player: Player):
     player.logger.info(f"Player is missing beatmap to spectate.")
     player.spectating.enqueue_cant_spectate(player.id)
 
-    for p in player.spectating.spectators:
-        p.enqueue_cant_spectate(player.id)
+    player.spectating.spectators.broadcast(
+        lambda p: p.enqueue_cant_spectate(player.id)
+    )
 
-@register(RequestPacket.SEND_FRAMES)
+@register(RequestPacket.SEND_FRAMES, blocking=False)
 def send_frames(player: Player, bundle: bReplayFrameBundle):
     if not player.spectators:
         return
 
-    for p in player.spectators:
-        p.enqueue_frames(bundle)
+    player.spectators.broadcast(
+        lambda p: p.enqueue_frames(bundle)
+    )
 
 @register(RequestPacket.JOIN_LOBBY)
 def join_lobby(player: Player):
-    for p in session.players:
-        p.enqueue_lobby_join(player.id)
+    session.players.broadcast(
+        lambda p: p.enqueue_lobby_join(player.id),
+        skip_congested=True
+    )
 
-    player.in_lobby = True
+    session.players.join_lobby(player)
 
     for match in session.matches.active:
         player.enqueue_match(match.bancho_match)
 
 @register(RequestPacket.PART_LOBBY)
 def part_lobby(player: Player):
-    player.in_lobby = False
+    session.players.part_lobby(player)
 
-    for p in session.players:
-        p.enqueue_lobby_part(player.id)
+    session.players.broadcast(
+        lambda p: p.enqueue_lobby_part(player.id),
+        skip_congested=True
+    )
 
 @register(RequestPacket.MATCH_INVITE)
 def invite(player: Player, target_id: int):
@@ -595,6 +627,12 @@ def invite(player: Player, target_id: int):
 
 @register(RequestPacket.CREATE_MATCH)
 def create_match(player: Player, bancho_match: bMatch):
+    if not config.MULTIPLAYER:
+        player.logger.warning('Tried to create match, but multiplayer is disabled')
+        player.enqueue_announcement('Multiplayer is disabled on this server.')
+        player.enqueue_matchjoin_fail()
+        return
+
     if not player.in_lobby:
         player.logger.warning('Tried to create match, but not in lobby')
         player.enqueue_matchjoin_fail()
@@ -777,8 +815,10 @@ def leave_match(player: Player):
         # No players in match anymore -> Disband match
         player.enqueue_match_disband(player.match.id)
 
-        for p in session.players.in_lobby:
-            p.enqueue_match_disband(player.match.id)
+        session.players.broadcast(
+            lambda p: p.enqueue_match_disband(player.match.id),
+            players=session.players.in_lobby
+        )
 
         session.matches.remove(player.match)
         player.match.starting = None
@@ -1116,7 +1156,7 @@ def load_complete(player: Player):
 
         player.match.update()
 
-@register(RequestPacket.MATCH_SKIP)
+@register(RequestPacket.MATCH_SKIP, blocking=False)
 def skip(player: Player):
     if not player.match:
         return
@@ -1131,17 +1171,21 @@ def skip(player: Player):
 
     slot.skipped = True
 
-    for p in player.match.players:
-        p.enqueue_player_skipped(id)
+    session.players.broadcast(
+        lambda p: p.enqueue_player_skipped(id),
+        players=player.match.players
+    )
 
     for slot in player.match.slots:
         if slot.status == SlotStatus.Playing and not slot.skipped:
             return
 
-    for p in player.match.players:
-        p.enqueue_match_skip()
+    session.players.broadcast(
+        lambda p: p.enqueue_match_skip(),
+        players=player.match.players
+    )
 
-@register(RequestPacket.MATCH_FAILED)
+@register(RequestPacket.MATCH_FAILED, blocking=False)
 def player_failed(player: Player):
     if not player.match:
         return
@@ -1154,10 +1198,12 @@ def player_failed(player: Player):
 
     slot.has_failed = True
 
-    for p in player.match.players:
-        p.enqueue_player_failed(slot_id)
+    session.players.broadcast(
+        lambda p: p.enqueue_player_failed(slot_id),
+        players=player.match.players
+    )
 
-@register(RequestPacket.MATCH_SCORE_UPDATE)
+@register(RequestPacket.MATCH_SCORE_UPDATE, blocking=False)
 def score_update(player: Player, scoreframe: bScoreFrame):
     if not player.match:
         return
@@ -1221,10 +1267,11 @@ def tourney_match_info(player: Player, match_id: int):
     player.logger.debug(f'Got tournament match info request for "{match.name}".')
     player.enqueue_match(match.bancho_match)
 
-@register(RequestPacket.ERROR_REPORT)
+@register(RequestPacket.ERROR_REPORT, blocking=False)
 def bancho_error(player: Player, error: str):
     session.logger.warning(f'Bancho Error Report:\n{error}')
 
 @register(RequestPacket.CHANGE_FRIENDONLY_DMS)
 def change_friendonly_dms(player: Player, enabled: bool):
     player.client.friendonly_dms = enabled
+    app.routing.publish_stats(player)
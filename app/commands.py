@@ -190,6 +190,28 @@ def execute_console(ctx: Context):
 
     return [str(eval(input))]
 
+@system_commands.register(['metrics', 'counters'], ['Admins'])
+def metrics(ctx: Context):
+    """- Show internal server metrics"""
+    return app.session.metrics.format() or ['No metrics were recorded yet.']
+
+@system_commands.register(['buffers', 'backlog'], ['Admins'])
+def buffers(ctx: Context):
+    """<amount> - Show the clients with the most outstanding data"""
+    amount = int(ctx.args[0]) if ctx.args and ctx.args[0].isdecimal() else 10
+
+    players = sorted(
+        app.session.players,
+        key=lambda player: player.buffer_depth,
+        reverse=True
+    )
+
+    return [
+        f'{player.name}: {player.buffer_depth} bytes'
+        f'{" (congested)" if player.congested else ""}'
+        for player in players[:amount]
+    ]
+
 @mp_commands.condition
 def inside_match(ctx: Context) -> bool:
     return ctx.player.match is not None
@@ -1209,6 +1231,7 @@ def restrict(ctx: Context) -> List | None:
 
         groups.delete_entry(player.id, 999)
         groups.delete_entry(player.id, 1000)
+        app.permissions.changed(player.id)
 
         # Update hardware
         clients.update_all(player.id, {'banned': True})
@@ -1256,6 +1279,7 @@ def unrestrict(ctx: Context) -> List | None:
     # Add to player & supporter group
     groups.create_entry(player.id, 999)
     groups.create_entry(player.id, 1000)
+    app.permissions.changed(player.id)
 
     # Update hardware
     clients.update_all(player.id, {'banned': False})
@@ -1314,6 +1338,7 @@ def kill(ctx: Context) -> List | None:
         return [f'User "{username}" was not found.']
 
     player.permissions = Permissions(255)
+    player.clear_packet_cache()
     player.enqueue_permissions()
     player.enqueue_ping()
 
@@ -0,0 +1,104 @@
+
+from concurrent.futures import ProcessPoolExecutor, Future
+from collections import OrderedDict
+from typing import Tuple
+
+import multiprocessing
+import threading
+import hashlib
+import bcrypt
+import config
+import time
+import app
+import os
+
+# Password changes result in a new bcrypt hash, which
+# will automatically invalidate the cached credentials
+CacheKey = Tuple[int, str, str]
+
+cache: "OrderedDict[CacheKey, float]" = OrderedDict()
+lock = threading.Lock()
+pool: ProcessPoolExecutor | None = None
+
+def get_pool() -> ProcessPoolExecutor:
+    """Get the process pool, which should be created on startup"""
+    global pool
+
+    with lock:
+        if pool is None:
+            # Forking this process is unsafe, since it runs other threads
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['bcrypt'])
+
+            pool = ProcessPoolExecutor(
+                config.BCRYPT_PROCESSES or os.cpu_count(),
+                mp_context=context
+            )
+
+        return pool
+
+def start() -> None:
+    """Create the process pool and start the fork server, before the first logins arrive"""
+    get_pool().submit(int)
+
+def shutdown() -> None:
+    global pool
+
+    with lock:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = None
+
+def cache_key(user_id: int, md5: str, hashed: str) -> CacheKey:
+    # Don't keep the password hashes of clients around in memory
+    return user_id, hashed, hashlib.sha256(md5.encode()).hexdigest()
+
+def cached(key: CacheKey) -> bool:
+    with lock:
+        if (expiry := cache.get(key)) is None:
+            return False
+
+        if expiry < time.monotonic():
+            del cache[key]
+            return False
+
+        cache.move_to_end(key)
+        return True
+
+def remember(key: CacheKey) -> None:
+    if config.CREDENTIAL_CACHE_SIZE <= 0:
+        return
+
+    with lock:
+        cache[key] = time.monotonic() + config.CREDENTIAL_CACHE_TTL
+        cache.move_to_end(key)
+
+        while len(cache) > config.CREDENTIAL_CACHE_SIZE:
+            cache.popitem(last=False)
+
+def submit(user_id: int, md5: str, hashed: str) -> Future:
+    """Start checking the md5 password of a client against its bcrypt hash"""
+    key = cache_key(user_id, md5, hashed)
+
+    if cached(key):
+        app.session.metrics.counter('login.bcrypt_cached').increment()
+        future = Future()
+        future.set_result(True)
+        return future
+
+    start = time.perf_counter()
+    future = get_pool().submit(
+        bcrypt.checkpw,
+        md5.encode(),
+        hashed.encode()
+    )
+
+    def on_result(future: Future) -> None:
+        app.session.metrics.average('login.bcrypt_ms').record((time.perf_counter() - start) * 1000)
+        app.session.metrics.counter('login.bcrypt').increment()
+
+        if not future.exception() and future.result():
+            remember(key)
+
+    future.add_done_callback(on_result)
+    return future
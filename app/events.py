@@ -64,6 +64,7 @@ def restrict(
         # Remove permissions
         groups.delete_entry(player.id, 999)
         groups.delete_entry(player.id, 1000)
+        app.permissions.changed(player.id)
 
         leaderboards.remove(
             player.id,
@@ -113,6 +114,7 @@ def unrestrict(user_id: int, restore_scores: bool = True):
     # Add to player & supporter group
     groups.create_entry(player.id, 999)
     groups.create_entry(player.id, 1000)
+    app.permissions.changed(player.id)
 
     # Update hardware
     clients.update_all(player.id, {'banned': False})
@@ -168,6 +170,16 @@ def user_update(user_id: int, mode: int | None = None):
         player.reload_object()
         enqueue_stats(player)
 
+@app.session.events.register('groups_changed')
+def groups_changed(user_id: int):
+    app.permissions.invalidate(user_id)
+
+    if not (player := app.session.players.by_id(user_id)):
+        return
+
+    player.reload_groups()
+    player.enqueue_permissions()
+
 @app.session.events.register('osu_error')
 def osu_error(user_id: int, error: dict):
     if not (player := app.session.players.by_id(user_id)):
@@ -219,7 +231,7 @@ def shutdown():
     exit()
 
 def enqueue_stats(player: Player):
-    for p in app.session.players:
+    for p in app.session.players.interested_in(player):
         if p.client.version.date > 20121223 and p.id != player.id:
             # Client will request the stats
             # themselves when pressing F9
@@ -232,3 +244,5 @@ def enqueue_stats(player: Player):
             continue
 
         p.enqueue_stats(player)
+
+    app.routing.publish_stats(player)
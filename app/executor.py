@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from twisted.internet.defer import Deferred, maybeDeferred, succeed
+from twisted.internet import threads, reactor
+from twisted.python.failure import Failure
+
+from typing import TYPE_CHECKING, Iterable, List, Tuple
+from app.common.streams import StreamIn
+from collections import deque
+
+if TYPE_CHECKING:
+    from app.objects.player import Player
+
+import gzip
+import app
+
+Packet = Tuple[int, bool, bytes | memoryview]
+
+class PacketExecutor:
+    """
+    Runs the packets of a single connection in the order they were received.
+
+    At most one batch per connection is in flight at a time. Packets that
+    arrive while a batch is being processed are picked up by the same worker
+    thread afterwards, instead of each packet being dispatched on its own.
+    """
+
+    def __init__(self, player: Player) -> None:
+        self.queue: deque[Packet | Deferred] = deque()
+        self.player = player
+        self.running = False
+
+    def __repr__(self) -> str:
+        return f'<PacketExecutor ({len(self.queue)} queued)>'
+
+    @property
+    def idle(self) -> bool:
+        return not self.running and not self.queue
+
+    def submit(self, packets: Iterable[Packet]) -> Deferred:
+        """
+        Queue packets to be processed. This needs to be called from the reactor thread.
+        The returned deferred will fire, once all of the given packets were handled.
+        """
+        packets = list(packets)
+
+        if not packets:
+            return succeed(None)
+
+        if self.idle and not self.blocking(packets):
+            # Packets with non-blocking handlers can be
+            # processed on the reactor thread directly
+            app.session.metrics.counter('executor.inline').increment()
+            return maybeDeferred(self.process, packets)
+
+        app.session.metrics.counter('executor.dispatched').increment()
+        deferred = Deferred()
+        self.queue.extend(packets)
+        self.queue.append(deferred)
+
+        if not self.running:
+            self.schedule()
+
+        return deferred
+
+    def blocking(self, packets: List[Packet]) -> bool:
+        """Check if any of the packets may block, while being handled"""
+        for packet_id, _, _ in packets:
+            try:
+                packet = self.player.request_packets(packet_id)
+            except ValueError:
+                return True
+
+            handler = app.session.handlers.get(packet)
+
+            if getattr(handler, 'blocking', True):
+                return True
+
+        return False
+
+    def process(self, packets: List[Packet]) -> None:
+        self.player.packets_received([
+            (
+                packet,
+                StreamIn(
+                    gzip.decompress(payload)
+                    if compression else bytes(payload)
+                )
+            )
+            for packet, compression, payload in packets
+        ])
+
+    def schedule(self) -> None:
+        self.running = True
+        deferred = threads.deferToThread(self.drain)
+        deferred.addBoth(self.drained)
+
+    def drain(self) -> None:
+        """Process every queued batch inside of a worker thread"""
+        batch: List[Tuple[int, StreamIn]] = []
+
+        while self.queue:
+            item = self.queue.popleft()
+
+            if not isinstance(item, Deferred):
+                batch.append(item)
+                continue
+
+            try:
+                self.process(batch)
+            except Exception as e:
+                reactor.callFromThread(item.errback, Failure(e))
+            else:
+                reactor.callFromThread(item.callback, None)
+            finally:
+                batch = []
+
+    def drained(self, result: None | Failure) -> None:
+        self.running = False
+
+        if isinstance(result, Failure):
+            self.player.logger.error(
+                f'Failed to process packets: {result.getErrorMessage()}',
+                exc_info=result.value
+            )
+
+        if self.queue:
+            # Packets were queued, after the
+            # worker thread finished its batch
+            self.schedule()
@@ -0,0 +1,68 @@
+from typing import Iterator, Tuple
+
+import struct
+
+Frame = Tuple[int, bool, memoryview]
+
+# Upper limit for a single packet payload, to
+# prevent clients from making us buffer forever
+MAX_PAYLOAD_SIZE = 8 * 1024 * 1024
+
+class PacketFramer:
+    """
+    Incremental parser for bancho packets.
+
+    Received data gets appended to a single buffer, and complete frames are
+    handed out as memoryviews into that buffer, so that payloads are never
+    copied while they are being parsed.
+    """
+
+    def __init__(self, legacy: bool = False) -> None:
+        # In version b323 and below, the header does not contain
+        # the compression flag, since compression is always enabled
+        self.header = struct.Struct('<HI' if legacy else '<H?I')
+        self.legacy = legacy
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def __repr__(self) -> str:
+        return f'<PacketFramer ({self.pending} bytes pending)>'
+
+    def __iter__(self) -> Iterator[Frame]:
+        buffer = self.buffer
+
+        while len(buffer) - self.offset >= self.header.size:
+            if self.legacy:
+                packet, length = self.header.unpack_from(buffer, self.offset)
+                compression = True
+            else:
+                packet, compression, length = self.header.unpack_from(buffer, self.offset)
+
+            if length > MAX_PAYLOAD_SIZE:
+                raise ValueError(f'Packet payload too large ({length} bytes)')
+
+            start = self.offset + self.header.size
+            end = start + length
+
+            if end > len(buffer):
+                # Wait for more data
+                return
+
+            self.offset = end
+            yield packet, compression, memoryview(buffer)[start:end]
+
+    @property
+    def pending(self) -> int:
+        """Amount of bytes that have not been parsed yet"""
+        return len(self.buffer) - self.offset
+
+    def feed(self, data: bytes) -> None:
+        """Append received data to the buffer"""
+        if self.offset:
+            # Payloads that were handed out may still reference the
+            # current buffer, so only the unparsed tail gets moved
+            # into a new one, instead of resizing it in place
+            self.buffer = self.buffer[self.offset:]
+            self.offset = 0
+
+        self.buffer += data
@@ -2,70 +2,162 @@
 from __future__ import annotations
 
 from app.common.constants import ANCHOR_WEB_RESPONSE
+from app.objects.buffer import OutboundBuffer
 from app.objects.client import OsuClient
-from app.common.streams import StreamIn
 from app.objects.player import Player
+from app.framing import PacketFramer
+from app.tokens import Token
 from app.common.helpers import ip
 from app.objects import OsuClient
 
 from twisted.internet.error import ConnectionDone
 from twisted.python.failure import Failure
 from twisted.web.resource import Resource
+from twisted.web.client import Agent, FileBodyProducer, HTTPConnectionPool, readBody
+from twisted.web.iweb import IResponse
+from twisted.web.http_headers import Headers
 from twisted.web.http import Request
-from twisted.internet import threads
+from twisted.internet import threads, defer, reactor
 from twisted.web import server
-from queue import Queue
+from typing import Hashable
+from io import BytesIO
 
 import config
-import gzip
-import uuid
+import time
 import app
 
+# Keeps connections to the other nodes open for proxied requests
+proxy_agent = Agent(reactor, pool=HTTPConnectionPool(reactor))
+
 class HttpPlayer(Player):
+    __slots__ = ('token', 'previous_token', 'outbound', 'waiter', 'wake_call')
+
     def __init__(self, address: str, port: int) -> None:
         super().__init__(address, port)
         self.protocol = 'http'
-        self.queue = Queue()
         self.token = ""
+        self.previous_token = ""
+        self.outbound = OutboundBuffer(
+            'http',
+            config.OUTBOUND_MAX_BYTES,
+            config.OUTBOUND_MAX_PACKETS
+        )
+
+        # Request that is waiting for data to be enqueued
+        self.waiter: defer.Deferred | None = None
+        self.wake_call = None
 
     @property
     def connected(self) -> bool:
         return self.token != ""
 
-    def enqueue(self, data: bytes):
-        self.queue.put(data)
+    @property
+    def buffer_depth(self) -> int:
+        """Amount of bytes, that are waiting for the next request of the client"""
+        return self.outbound.size
 
-    def dequeue(self, max: int = 4096) -> bytes:
-        data = b""
+    def enqueue(self, data: bytes, key: Hashable | None = None):
+        if self.outbound.size >= config.HTTP_OUTBOUND_LIMIT:
+            # Client stopped polling and will be disconnected
+            return
+
+        self.outbound.append(data, key)
+        app.session.metrics.counter('http.packets').increment()
 
-        while not self.queue.empty():
-            data += self.queue.get()
+        if self.outbound.size >= config.HTTP_OUTBOUND_LIMIT:
+            self.logger.warning(
+                f'Outbound buffer limit reached ({self.outbound.size} bytes), closing connection.'
+            )
+            # Disconnecting accesses the database, so it must not run on the reactor
+            reactor.callFromThread(threads.deferToThread, self.close_connection)
+
+        elif self.outbound.exceeded and not self.congested_since:
+            # Client is not polling fast enough, stop sending
+            # non-critical updates until the buffer was drained
+            self.logger.warning(
+                f'Outbound buffer exceeded ({len(self.outbound)} packets, {self.outbound.size} bytes)'
+            )
+            self.congested_since = time.time()
+            app.session.metrics.counter('http.congestions').increment()
+
+        if self.waiter is not None:
+            reactor.callFromThread(self.wake)
+
+    def dequeue(self, max: int = 4096) -> bytes:
+        # Let client perform fast-read, if there is more data
+        data = b''.join(self.outbound.pop(max))
 
-            if len(data) > max:
-                # Let client perform fast-read
-                break
+        if not self.outbound.exceeded:
+            self.congested_since = None
 
         return data
 
-    def login_received(self, username: str, md5: str, client: OsuClient) -> None:
-        super().login_received(username, md5, client)
+    def wait(self, timeout: float) -> defer.Deferred:
+        """
+        Wait until data was enqueued or the timeout was reached.
+        This needs to be called from the reactor thread.
+        """
+        # Release the request that was parked before
+        self.wake()
+
+        self.waiter = deferred = defer.Deferred()
+        self.wake_call = reactor.callLater(timeout, self.wake)
 
-        if self.logged_in:
-            self.token = str(uuid.uuid4())
+        if len(self.outbound) or not self.connected:
+            # Data was enqueued before the waiter was set
+            self.wake()
+
+        return deferred
+
+    def wake(self, request: defer.Deferred | None = None) -> None:
+        """Release the parked request, or only the given one if it is still parked"""
+        if (waiter := self.waiter) is None:
+            return
+
+        if request is not None and waiter is not request:
+            return
+
+        self.waiter = None
+
+        if self.wake_call.active():
+            self.wake_call.cancel()
+
+        waiter.callback(None)
+
+    def login_success(self) -> None:
+        # The token needs to be assigned before the
+        # player gets added to the player collection
+        self.token = app.tokens.generate(self.id)
+        super().login_success()
+
+    def refresh_token(self) -> str:
+        """Replace the token of this session, before it expires"""
+        token = app.tokens.generate(self.id)
+        app.session.players.update_token(self, token)
+        return token
 
     def close_connection(self, error: Exception | None = None) -> None:
         if error:
             self.send_error()
 
         self.logger.info(f'Closing connection -> <{self.address}>')
-        self.token = ""
         super().connectionLost(Failure(error or ConnectionDone()))
+        self.token = ""
+
+        # Send the remaining data to a parked request
+        reactor.callFromThread(self.wake)
 
 class HttpBanchoProtocol(Resource):
     isLeaf = True
 
     def handle_login_request(self, request: Request):
-        d = threads.deferToThread(self.process_login, request)
+        # Logins wait for a free slot on the reactor, instead of a thread
+        d = app.admission.submit(
+            ip.resolve_ip_address_twisted(request),
+            self.process_login,
+            request
+        )
+        d.addErrback(self.on_login_rejected)
         d.addCallback(self.on_login_success, request)
         d.addErrback(self.on_login_error, request)
         return server.NOT_DONE_YET
@@ -130,6 +222,11 @@ class HttpBanchoProtocol(Resource):
         request.write(result)
         request.finish()
 
+    def on_login_rejected(self, failure: Failure) -> bytes:
+        failure.trap(app.admission.LoginRejected)
+        app.session.logger.warning(f'Login was rejected: {failure.getErrorMessage()}')
+        return self.force_reconnect(app.admission.retry_delay())
+
     def on_login_error(self, failure: Failure, request: Request) -> None:
         app.session.logger.error(
             f'Failed to process login: {failure.getErrorMessage()}'
@@ -145,29 +242,110 @@ class HttpBanchoProtocol(Resource):
         request.finish()
 
     def handle_request(self, player: HttpPlayer, request: Request):
-        d = threads.deferToThread(self.process_request, player, request)
+        d = self.process_request(player, request)
         d.addErrback(self.on_request_error, player, request)
         d.addCallback(self.on_request_success, request)
         return server.NOT_DONE_YET
 
-    def process_request(self, player: HttpPlayer, request: Request) -> bytes:
-        stream = StreamIn(request.content.read())
+    def process_request(self, player: HttpPlayer, request: Request) -> defer.Deferred:
+        framer = PacketFramer()
+        framer.feed(request.content.read())
+        packets = list(framer)
+
+        # Packets will be processed in order, on the player's worker thread
+        d = defer.maybeDeferred(player.executor.submit, packets)
 
-        while not stream.eof():
-            packet = stream.u16()
-            compression = stream.bool()
-            payload = stream.read(stream.u32())
+        if config.HTTP_LONGPOLL_TIMEOUT > 0 and self.is_idle_request(player, packets):
+            d.addCallback(lambda _: self.hold_request(player, request))
 
-            if compression:
-                payload = gzip.decompress(payload)
+        d.addCallback(lambda _: self.read_response(player, request))
+        return d
 
-            player.packet_received(
-                packet_id=packet,
-                stream=StreamIn(payload)
+    def is_idle_request(self, player: HttpPlayer, packets: list) -> bool:
+        """Check if a request contains nothing but pings"""
+        try:
+            return all(
+                player.request_packets(packet).name == 'PONG'
+                for packet, _, _ in packets
             )
+        except ValueError:
+            return False
+
+    def hold_request(self, player: HttpPlayer, request: Request) -> defer.Deferred | None:
+        """Park the request, until data is available for the client"""
+        if len(player.outbound) or request._disconnected:
+            return
+
+        app.session.metrics.counter('http.parked').increment()
+        waiter = player.wait(config.HTTP_LONGPOLL_TIMEOUT)
+
+        # Release the request if its client went away, but not
+        # a newer request that was parked in the meantime
+        request.notifyFinish().addErrback(lambda _: player.wake(waiter))
+        return waiter
+
+    def read_response(self, player: HttpPlayer, request: Request) -> bytes:
+        if request._disconnected:
+            # Keep the data for the next request
+            return b''
 
         return player.dequeue()
 
+    def handle_foreign_request(self, token: Token, request: Request):
+        if not (url := config.NODES.get(token.node)):
+            app.session.logger.warning(f'Got request for unknown node "{token.node}"')
+            return self.force_reconnect()
+
+        if request.getHeader('x-anchor-node'):
+            # Request was proxied to us already
+            return self.force_reconnect()
+
+        d = self.proxy_request(url, request)
+        d.addCallback(self.on_request_success, request)
+        d.addErrback(self.on_proxy_error, token, request)
+
+        # Stop waiting for the other node, if the client went away
+        request.notifyFinish().addErrback(lambda _: d.cancel())
+        return server.NOT_DONE_YET
+
+    def proxy_request(self, url: str, request: Request) -> defer.Deferred:
+        """Forward a request to the node, that owns the session"""
+        # Long-polls can take a while, so this must not occupy a thread
+        d = proxy_agent.request(
+            b'POST',
+            url.encode(),
+            Headers({
+                'User-Agent': ['osu!'],
+                'osu-token': [request.getHeader('osu-token')],
+                'x-anchor-node': [config.NODE_ID]
+            }),
+            FileBodyProducer(BytesIO(request.content.read()))
+        )
+        d.addCallback(self.on_proxy_response, request)
+        d.addTimeout(config.HTTP_LONGPOLL_TIMEOUT + 10, reactor)
+        return d
+
+    def on_proxy_response(self, response: IResponse, request: Request) -> defer.Deferred:
+        request.setResponseCode(response.code)
+
+        for header in (b'cho-token', b'connection'):
+            if values := response.headers.getRawHeaders(header):
+                request.setHeader(header, values[0])
+
+        return readBody(response)
+
+    def on_proxy_error(self, failure: Failure, token: Token, request: Request) -> None:
+        app.session.logger.error(
+            f'Failed to proxy request to "{token.node}": {failure.getErrorMessage()}'
+        )
+
+        if request.finished or request._disconnected:
+            return
+
+        # Let the client log in on this node instead
+        request.write(self.force_reconnect())
+        request.finish()
+
     def on_request_success(self, result: bytes, request: Request) -> None:
         if request.finished or request._disconnected:
             return
@@ -187,9 +365,9 @@ class HttpBanchoProtocol(Resource):
         request.write(player.dequeue())
         request.finish()
 
-    def force_reconnect(self) -> bytes:
+    def force_reconnect(self, delay: int = 0) -> bytes:
         """Force a client to reconnect, using the Restart packet."""
-        return b'\x56\x00\x00\x04\x00\x00\x00\x00\x00\x00\x00'
+        return b'\x56\x00\x00\x04\x00\x00\x00' + delay.to_bytes(4, 'little')
 
     def server_error_packet(self) -> bytes:
         """Tell the client something went really wrong."""
@@ -213,6 +391,12 @@ class HttpBanchoProtocol(Resource):
         if not (osu_token := request.getHeader('osu-token')):
             return self.handle_login_request(request)
 
+        if not (token := app.tokens.validate(osu_token)):
+            return self.force_reconnect()
+
+        if token.node != config.NODE_ID:
+            return self.handle_foreign_request(token, request)
+
         if not (player := app.session.players.by_token(osu_token)):
             return self.force_reconnect()
 
@@ -221,4 +405,8 @@ class HttpBanchoProtocol(Resource):
             request.setResponseCode(401)
             return b''
 
+        if osu_token == player.token and app.tokens.needs_refresh(token):
+            # The previous token stays valid, until the client uses the new one
+            request.setHeader('cho-token', player.refresh_token())
+
         return self.handle_request(player, request)
@@ -0,0 +1,25 @@
+
+from typing import Any, MutableMapping, Tuple
+
+import logging
+
+class ContextLogger(logging.LoggerAdapter):
+    """
+    Prefixes the messages of a shared logger with the name of a player, channel or match.
+    Unlike logging.getLogger, this does not register a new logger for every name,
+    which would never be freed again.
+    """
+
+    def __init__(self, logger: logging.Logger, context: str) -> None:
+        super().__init__(logger, {'context': context})
+
+    def __repr__(self) -> str:
+        return f'<ContextLogger {self.logger.name} "{self.extra["context"]}">'
+
+    def process(self, msg: Any, kwargs: MutableMapping[str, Any]) -> Tuple[Any, MutableMapping[str, Any]]:
+        kwargs['extra'] = {**self.extra, **kwargs.get('extra', {})}
+        return f'[{self.extra["context"]}] {msg}', kwargs
+
+players = logging.getLogger('players')
+channels = logging.getLogger('channels')
+matches = logging.getLogger('matches')
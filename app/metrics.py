@@ -0,0 +1,111 @@
+from typing import Callable, Dict, List
+
+import threading
+import time
+
+class Counter:
+    """Thread-safe counter, that also keeps track of its rate per second"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.total = 0
+        self.second = 0
+        self.current = 0
+        self.previous = 0
+
+    def __repr__(self) -> str:
+        return f'{self.total} ({self.rate}/s)'
+
+    @property
+    def rate(self) -> int:
+        """Amount of increments in the last completed second"""
+        second = int(time.time())
+
+        if second == self.second:
+            return self.previous
+
+        if second == self.second + 1:
+            return self.current
+
+        return 0
+
+    def increment(self, amount: int = 1) -> None:
+        second = int(time.time())
+
+        with self.lock:
+            if second != self.second:
+                self.previous = (
+                    self.current
+                    if second == self.second + 1
+                    else 0
+                )
+                self.second = second
+                self.current = 0
+
+            self.current += amount
+            self.total += amount
+
+class Average:
+    """Thread-safe running average of recorded values"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.count = 0
+        self.sum = 0
+
+    def __repr__(self) -> str:
+        return f'{self.value:.2f} (n={self.count})'
+
+    @property
+    def value(self) -> float:
+        return (self.sum / self.count) if self.count else 0.0
+
+    def record(self, value: float) -> None:
+        with self.lock:
+            self.count += 1
+            self.sum += value
+
+class Metrics:
+    """Collection of named counters, averages and gauges"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Counter] = {}
+        self.averages: Dict[str, Average] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+
+    def counter(self, name: str) -> Counter:
+        """Get or create a counter"""
+        if (counter := self.counters.get(name)) is not None:
+            return counter
+
+        with self.lock:
+            return self.counters.setdefault(name, Counter())
+
+    def average(self, name: str) -> Average:
+        """Get or create an average"""
+        if (average := self.averages.get(name)) is not None:
+            return average
+
+        with self.lock:
+            return self.averages.setdefault(name, Average())
+
+    def gauge(self, name: str, callback: Callable[[], float]) -> None:
+        """Register a value, that gets evaluated when reading the metrics"""
+        self.gauges[name] = callback
+
+    def format(self) -> List[str]:
+        """Get a readable representation of all metrics"""
+        lines = [
+            f'{name}: {metric}'
+            for metrics in (self.counters, self.averages)
+            for name, metric in sorted(metrics.items())
+        ]
+
+        for name, callback in sorted(self.gauges.items()):
+            try:
+                lines.append(f'{name}: {callback()}')
+            except Exception as e:
+                lines.append(f'{name}: {e}')
+
+        return lines
@@ -0,0 +1,120 @@
+from typing import Deque, Hashable, List, Tuple
+from collections import deque
+
+import threading
+import app
+
+Entry = Tuple[bytes, Hashable | None]
+
+class OutboundBuffer:
+    """
+    Thread-safe buffer for packets, that have not been written to a client yet.
+
+    Packets can be enqueued with a key, e.g. the user id of a stats update.
+    Once the buffer exceeds its watermarks, older packets with the same key
+    get dropped, since they were superseded by the newer ones.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int,
+        max_packets: int
+    ) -> None:
+        self.lock = threading.Lock()
+        self.packets: Deque[Entry] = deque()
+        self.size = 0
+
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_packets = max_packets
+
+        # Thresholds for the next compaction, which grow
+        # with the buffer to keep appending in linear time
+        self.compaction_bytes = max_bytes
+        self.compaction_packets = max_packets
+
+    def __repr__(self) -> str:
+        return f'<OutboundBuffer ({len(self)} packets, {self.size} bytes)>'
+
+    def __len__(self) -> int:
+        return len(self.packets)
+
+    @property
+    def exceeded(self) -> bool:
+        """Whether the buffer is above one of its watermarks"""
+        return (
+            self.size > self.max_bytes or
+            len(self.packets) > self.max_packets
+        )
+
+    def append(self, data: bytes, key: Hashable | None = None) -> bool:
+        """Append data to the buffer and return whether it was empty before"""
+        with self.lock:
+            self.packets.append((data, key))
+            self.size += len(data)
+
+            if (
+                self.size > self.compaction_bytes or
+                len(self.packets) > self.compaction_packets
+            ):
+                self.compact()
+
+            return len(self.packets) == 1
+
+    def pop(self, max_bytes: int) -> List[bytes]:
+        """Remove and return the oldest packets, until they exceed the given size"""
+        with self.lock:
+            packets = []
+            size = 0
+
+            while self.packets:
+                data, _ = self.packets.popleft()
+                packets.append(data)
+                size += len(data)
+
+                if size > max_bytes:
+                    break
+
+            self.size -= size
+
+            if not self.packets:
+                self.compaction_bytes = self.max_bytes
+                self.compaction_packets = self.max_packets
+
+        return packets
+
+    def pop_all(self) -> List[bytes]:
+        """Remove and return all buffered packets"""
+        with self.lock:
+            packets, self.packets = self.packets, deque()
+            self.size = 0
+            self.compaction_bytes = self.max_bytes
+            self.compaction_packets = self.max_packets
+
+        return [data for data, _ in packets]
+
+    def compact(self) -> None:
+        """Drop packets, that were superseded by a newer packet with the same key"""
+        # NOTE: The lock needs to be acquired by the caller
+        seen = set()
+        packets = deque()
+
+        for data, key in reversed(self.packets):
+            if key is not None:
+                if key in seen:
+                    continue
+
+                seen.add(key)
+
+            packets.appendleft((data, key))
+
+        dropped = len(self.packets) - len(packets)
+
+        self.packets = packets
+        self.size = sum(len(data) for data, _ in packets)
+        self.compaction_bytes = max(self.max_bytes, self.size * 2)
+        self.compaction_packets = max(self.max_packets, len(packets) * 2)
+
+        app.session.metrics.counter(f'{self.name}.compactions').increment()
+        app.session.metrics.counter(f'{self.name}.superseded').increment(dropped)
@@ -8,14 +8,21 @@ from app.common.database.repositories import messages
 from app.common.constants.strings import BAD_WORDS
 from app.common.objects import bMessage, bChannel
 from app.common.constants import Permissions
+from app.permissions import Groups
+from app.logger import ContextLogger
+from app import logger
 from app.objects import collections
 from app.common import officer
 
-import logging
 import config
 import app
 
 class Channel:
+    __slots__ = (
+        'name', 'owner', 'topic', 'read_perms', 'write_perms',
+        'moderated', 'public', 'logger', 'users'
+    )
+
     def __init__(
         self,
         name: str,
@@ -34,7 +41,7 @@ class Channel:
         self.moderated = False
         self.public = public
 
-        self.logger = logging.getLogger(self.name)
+        self.logger = ContextLogger(logger.channels, self.name)
         self.users = collections.Players()
 
     def __repr__(self) -> str:
@@ -48,7 +55,7 @@ class Channel:
 
     @property
     def user_count(self) -> int:
-        return len(self.users)
+        return len(self.users) + app.routing.remote_member_count(self)
 
     @property
     def bancho_channel(self) -> bChannel:
@@ -76,9 +83,6 @@ class Channel:
         return perms.value >= self.write_perms
 
     def add(self, player: "Player", no_response: bool = False) -> None:
-        # Update player's silence duration
-        player.silenced
-
         if not self.can_read(player.permissions):
             # Player does not have read access
             self.logger.warning(f'{player} tried to join channel but does not have read access.')
@@ -95,6 +99,7 @@ class Channel:
         player.channels.add(self)
         self.users.add(player)
         self.update()
+        app.routing.publish_channel_members(self)
 
         if not no_response:
             player.join_success(self.display_name)
@@ -104,26 +109,29 @@ class Channel:
     def remove(self, player: "Player") -> None:
         self.users.remove(player)
         self.update()
+        app.routing.publish_channel_members(self)
 
         if self in player.channels:
             player.channels.remove(self)
 
     def update(self) -> None:
+        channel = self.bancho_channel
+
         if not self.public:
             # Only enqueue to users in this channel
-            for player in self.users:
-                player.enqueue_channel(
-                    self.bancho_channel,
-                    autojoin=False
-                )
+            self.users.broadcast(
+                lambda player: player.enqueue_channel(channel, autojoin=False)
+            )
             return
 
-        for player in app.session.players:
-            if self.can_read(player.permissions):
-                player.enqueue_channel(
-                    self.bancho_channel,
-                    autojoin=False
-                )
+        app.session.players.broadcast(
+            lambda player: player.enqueue_channel(channel, autojoin=False),
+            players=(
+                player for player in app.session.players
+                if self.can_read(player.permissions)
+            ),
+            skip_congested=True
+        )
 
     def send_message(
         self,
@@ -142,15 +150,7 @@ class Channel:
             return
 
         if self.moderated:
-            allowed_groups = [
-                'Admins',
-                'Developers',
-                'Beatmap Approval Team',
-                'Global Moderator Team',
-                'Tournament Manager Team'
-            ]
-
-            if not any([group in sender.groups for group in allowed_groups]):
+            if not sender.group_flags & Groups.ModeratedChat:
                 return
 
         if sender.silenced:
@@ -199,9 +199,14 @@ class Channel:
             sender.id
         )
 
-        for user in users:
-            # Enqueue message to every user inside this channel
-            user.enqueue_message(message_object)
+        # Enqueue message to every user inside this channel
+        self.users.broadcast(
+            lambda user: user.enqueue_message(message_object),
+            players=users
+        )
+
+        # Deliver message to users of other nodes
+        app.routing.publish_channel_message(self, sender, message)
 
         messages.create(
             sender.name,
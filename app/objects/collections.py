@@ -2,75 +2,236 @@
 from __future__ import annotations
 from enum import Enum
 from typing import (
+    Callable,
     Iterable,
     Iterator,
+    KeysView,
+    FrozenSet,
+    Tuple,
     List,
+    Dict,
     Set
 )
 
+from app.common.constants import PresenceFilter
 from ..http import HttpPlayer
 from .player import Player
 
+import itertools
 import threading
+import config
 import app
 
 class Players(Set[Player | HttpPlayer]):
+    """
+    Collection of players, that keeps indexes for lookups by id, name and token.
+    The indexes are updated together with the collection, while holding its lock.
+    """
+
+    MEMBERSHIPS = (
+        'in_lobby',
+        'tourney_clients',
+        'normal_clients',
+        'http_clients',
+        'tcp_clients',
+        'presence_all',
+        'presence_filtered'
+    )
+
     def __init__(self):
         self.lock = threading.Lock()
+        self.snapshot: Tuple[Player, ...] | None = None
+        self.id_index: Dict[int, Player] = {}
+        self.name_index: Dict[str, Player] = {}
+        self.token_index: Dict[str, HttpPlayer] = {}
+        self.tourney_index: Dict[int, Set[Player]] = {}
+        self.memberships: Dict[str, Set[Player]] = {name: set() for name in self.MEMBERSHIPS}
+        self.views: Dict[str, FrozenSet[Player]] = {}
+        self.dirty_stats: Dict[Player, None] = {}
         super().__init__()
 
     def __iter__(self) -> Iterator[Player]:
-        with self.lock:
-            players = iter(list(super().__iter__()))
-        return players
-
-    def __len__(self) -> int:
-        with self.lock:
-            return len(list(super().__iter__()))
+        if (players := self.snapshot) is None:
+            with self.lock:
+                players = self.snapshot = tuple(super().__iter__())
 
-    def __contains__(self, player: Player) -> bool:
-        with self.lock:
-            return super().__contains__(player)
+        return iter(players)
 
     def __repr__(self) -> str:
-        with self.lock:
-            return f'<Players ({len(self)})>'
+        return f'<Players ({len(self)})>'
 
     @property
-    def ids(self) -> Set[int]:
-        return {p.id for p in self}
+    def ids(self) -> KeysView[int]:
+        return self.id_index.keys()
 
     @property
-    def in_lobby(self) -> Set[Player]:
-        return {p for p in self if p.in_lobby}
+    def in_lobby(self) -> FrozenSet[Player]:
+        return self.view('in_lobby')
 
     @property
-    def tourney_clients(self) -> Set[Player]:
-        return {p for p in self if p.is_tourney_client}
+    def tourney_clients(self) -> FrozenSet[Player]:
+        return self.view('tourney_clients')
 
     @property
-    def normal_clients(self) -> Set[Player]:
-        return {p for p in self if not p.is_tourney_client}
+    def normal_clients(self) -> FrozenSet[Player]:
+        return self.view('normal_clients')
 
     @property
-    def http_clients(self) -> Set[HttpPlayer]:
-        return {p for p in self if isinstance(p, HttpPlayer)}
+    def http_clients(self) -> FrozenSet[HttpPlayer]:
+        return self.view('http_clients')
 
     @property
-    def tcp_clients(self) -> Set[Player]:
-        return {p for p in self if not isinstance(p, HttpPlayer)}
+    def tcp_clients(self) -> FrozenSet[Player]:
+        return self.view('tcp_clients')
+
+    @property
+    def normal_count(self) -> int:
+        return len(self.memberships['normal_clients'])
+
+    def view(self, name: str) -> FrozenSet[Player]:
+        """Get a snapshot of a membership set, which is cached until it changes"""
+        if (players := self.views.get(name)) is not None:
+            return players
+
+        with self.lock:
+            return self.views.setdefault(name, frozenset(self.memberships[name]))
 
     def add(self, player: Player) -> None:
         """Append a player to the collection"""
         self.send_player(player)
-        return super().add(player)
+
+        with self.lock:
+            super().add(player)
+            self.add_to_indexes(player)
+            self.add_to_memberships(player)
+            self.snapshot = None
 
     def remove(self, player: Player) -> None:
         """Remove a player from the collection"""
-        try:
-            return super().remove(player)
-        except (ValueError, KeyError):
-            pass
+        with self.lock:
+            try:
+                super().remove(player)
+            except (ValueError, KeyError):
+                return
+
+            self.remove_from_indexes(player)
+            self.remove_from_memberships(player)
+            self.snapshot = None
+
+    def join_lobby(self, player: Player) -> None:
+        """Mark a player as being inside the lobby"""
+        with self.lock:
+            player.in_lobby = True
+
+            if player in self:
+                self.update_membership('in_lobby', player, True)
+
+    def part_lobby(self, player: Player) -> None:
+        """Mark a player as no longer being inside the lobby"""
+        with self.lock:
+            player.in_lobby = False
+            self.update_membership('in_lobby', player, False)
+
+    def set_filter(self, player: Player, filter: PresenceFilter) -> None:
+        """Update the presence filter of a player"""
+        with self.lock:
+            player.filter = filter
+            player.filter_received = True
+
+            if player not in self:
+                return
+
+            self.update_membership('presence_all', player, filter == PresenceFilter.All)
+            self.update_membership('presence_filtered', player, filter != PresenceFilter.All)
+
+    def interested_in(self, player: Player) -> Iterable[Player]:
+        """Get all players, whose presence filter allows updates about this player"""
+        return itertools.chain(
+            self.view('presence_all'),
+            (
+                p for p in self.view('presence_filtered')
+                if p.receives_updates_from(player)
+            )
+        )
+
+    def add_to_indexes(self, player: Player) -> None:
+        name = player.name.lower()
+
+        if player.is_tourney_client:
+            # Prefer the normal client for lookups, if there is one
+            self.tourney_index.setdefault(player.id, set()).add(player)
+            self.id_index.setdefault(player.id, player)
+            self.name_index.setdefault(name, player)
+        else:
+            self.id_index[player.id] = player
+            self.name_index[name] = player
+
+        if token := getattr(player, 'token', None):
+            self.token_index[token] = player
+
+        if token := getattr(player, 'previous_token', None):
+            self.token_index[token] = player
+
+    def remove_from_indexes(self, player: Player) -> None:
+        tourney_clients = self.tourney_index.get(player.id, set())
+        tourney_clients.discard(player)
+
+        if not tourney_clients:
+            self.tourney_index.pop(player.id, None)
+
+        # Fall back to one of the remaining tourney clients
+        replacement = next(iter(tourney_clients), None)
+
+        for index, key in (
+            (self.id_index, player.id),
+            (self.name_index, player.name.lower())
+        ):
+            if index.get(key) is not player:
+                continue
+
+            if replacement:
+                index[key] = replacement
+            else:
+                del index[key]
+
+        for token in (
+            getattr(player, 'token', None),
+            getattr(player, 'previous_token', None)
+        ):
+            if token and self.token_index.get(token) is player:
+                del self.token_index[token]
+
+    def add_to_memberships(self, player: Player) -> None:
+        is_http = isinstance(player, HttpPlayer)
+
+        for name, member in (
+            ('in_lobby', player.in_lobby),
+            ('tourney_clients', player.is_tourney_client),
+            ('normal_clients', not player.is_tourney_client),
+            ('http_clients', is_http),
+            ('tcp_clients', not is_http),
+            ('presence_all', player.filter == PresenceFilter.All),
+            ('presence_filtered', player.filter != PresenceFilter.All)
+        ):
+            self.update_membership(name, player, member)
+
+    def remove_from_memberships(self, player: Player) -> None:
+        for name in self.MEMBERSHIPS:
+            self.update_membership(name, player, False)
+
+    def update_membership(self, name: str, player: Player, member: bool) -> None:
+        # NOTE: The lock needs to be acquired by the caller
+        players = self.memberships[name]
+
+        if member == (player in players):
+            return
+
+        if member:
+            players.add(player)
+        else:
+            players.discard(player)
+
+        self.views.pop(name, None)
 
     def enqueue(self, data: bytes, immune = []) -> None:
         """Send raw data to all players"""
@@ -80,63 +241,169 @@ class Players(Set[Player | HttpPlayer]):
 
     def by_id(self, id: int) -> Player | None:
         """Get a player by id"""
-        return next(
-            (p for p in self if p.id == id),
-            (app.session.bot_player if id == 1 else None)
-        )
+        if (player := self.id_index.get(id)) is not None:
+            return player
+
+        return app.session.bot_player if id == 1 else None
 
     def by_name(self, name: str) -> Player | None:
         """Get a player by name"""
-        return next(
-            (p for p in self if p.name == name),
-            (app.session.bot_player if name == app.session.bot_player.name else None)
-        )
+        if (player := self.name_index.get(name.lower())) is not None:
+            return player
+
+        if name == app.session.bot_player.name:
+            return app.session.bot_player
+
+        return None
+
+    def update_token(self, player: HttpPlayer, token: str) -> None:
+        """Assign a new token to a player, while keeping its current one valid"""
+        with self.lock:
+            if self.token_index.get(player.previous_token) is player:
+                del self.token_index[player.previous_token]
+
+            player.previous_token, player.token = player.token, token
+            self.token_index[token] = player
 
     def by_token(self, token: str) -> Player | None:
         """Get a player by token"""
-        return next(
-            (p for p in self.http_clients if p.token == token),
-            None
-        )
+        return self.token_index.get(token)
 
     def get_all_tourney_clients(self, id: int) -> List[Player]:
         """Get all tourney clients for a player id"""
-        return [p for p in self.tourney_clients if p.id == id]
+        return list(self.tourney_index.get(id, ()))
 
     def get_rank_duplicates(self, rank: int, mode: int) -> List[Player]:
         """Get all players with the specified rank"""
         return [p for p in self if p.rank == rank and p.status.mode == mode]
 
+    def broadcast(
+        self,
+        action: Callable[[Player], None],
+        players: Iterable[Player] | None = None,
+        skip_congested: bool = False
+    ) -> None:
+        """
+        Run the action once per client version, and enqueue the
+        resulting packets to every player that shares this version.
+        """
+        groups: Dict[Tuple[int, int], List[Player]] = {}
+
+        for player in (self if players is None else players):
+            if skip_congested and player.congested:
+                continue
+
+            # Clients with the same version share their encoders
+            # and take the same branches inside the enqueue methods
+            version = (player.client.version.date, id(player.encoders))
+            groups.setdefault(version, []).append(player)
+
+        encoded = 0
+        enqueued = 0
+
+        for recipients in groups.values():
+            try:
+                packets = recipients[0].capture_packets(action)
+            except Exception as e:
+                recipients[0].logger.warning(
+                    f'Failed to encode broadcast: {e}',
+                    exc_info=e
+                )
+                continue
+
+            for data, key in packets:
+                for player in recipients:
+                    player.enqueue(data, key)
+
+                encoded += len(data)
+                enqueued += len(data) * len(recipients)
+
+        app.session.metrics.counter('broadcast.encoded_bytes').increment(encoded)
+        app.session.metrics.counter('broadcast.enqueued_bytes').increment(enqueued)
+
     def send_packet(self, packet: Enum, *args):
-        for p in self:
-            p.send_packet(packet, *args)
+        self.broadcast(lambda p: p.send_packet(packet, *args))
 
     def send_player(self, player: Player):
-        for p in self:
-            p.enqueue_player(player)
+        self.broadcast(
+            lambda p: p.enqueue_player(player),
+            players=self.interested_in(player)
+        )
 
     def send_player_bundle(self, players: List[Player]):
-        for p in self:
-            p.enqueue_players(players)
+        self.broadcast(
+            lambda p: p.enqueue_players(players)
+        )
 
     def send_presence(self, player: Player, update: bool = False):
-        for p in self:
-            p.enqueue_presence(player, update)
+        self.broadcast(
+            lambda p: p.enqueue_presence(player, update),
+            players=self.interested_in(player)
+        )
 
     def send_stats(self, player: Player):
-        for p in self:
-            p.enqueue_stats(player)
+        self.broadcast(
+            lambda p: p.enqueue_stats(player),
+            players=self.interested_in(player)
+        )
+
+    def queue_stats(self, player: Player):
+        """Mark the stats of a player as changed, to be sent with the next flush"""
+        if config.STATS_INTERVAL <= 0:
+            self.send_stats(player)
+            app.routing.publish_stats(player)
+            return
+
+        with self.lock:
+            if player in self.dirty_stats:
+                app.session.metrics.counter('stats.coalesced').increment()
+                return
+
+            self.dirty_stats[player] = None
+
+    def flush_stats(self):
+        """Send the latest stats of every player, that has changed since the last flush"""
+        with self.lock:
+            players, self.dirty_stats = self.dirty_stats, {}
+
+        # Players may have disconnected in the meantime
+        players = [player for player in players if player in self]
+
+        if not players:
+            return
+
+        def enqueue_stats(p: Player):
+            for player in players:
+                p.enqueue_stats(player)
+
+        self.broadcast(
+            enqueue_stats,
+            players=self.view('presence_all')
+        )
+
+        # Clients with a presence filter only get the players they are interested in
+        for p in self.view('presence_filtered'):
+            for player in players:
+                if p.receives_updates_from(player):
+                    p.enqueue_stats(player)
+
+        for player in players:
+            app.routing.publish_stats(player)
+
+        app.session.metrics.counter('stats.flushed').increment(len(players))
 
     def announce(self, message: str):
-        for p in self:
-            p.enqueue_announcement(message)
+        self.broadcast(lambda p: p.enqueue_announcement(message))
 
     def send_user_quit(self, user_quit):
-        for p in self:
+        def enqueue_quit(player: Player):
             try:
-                p.enqueue_quit(user_quit)
+                player.enqueue_quit(user_quit)
             except AttributeError:
-                continue
+                # Quit packet is not supported
+                pass
+
+        self.broadcast(enqueue_quit)
 
 from .channel import Channel
 
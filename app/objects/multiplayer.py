@@ -21,15 +21,22 @@ from app.common.database.repositories import beatmaps, events, matches
 from app.common.objects import bMatch, bSlot, bScoreFrame
 from app.common.database import DBMatch
 
+from app.logger import ContextLogger
+from app import logger
+
 from .channel import Channel
 from .player import Player
 
-import logging
 import config
 import time
 import app
 
 class Slot:
+    __slots__ = (
+        'last_frame', 'player', 'status', 'team',
+        'mods', 'has_failed', 'loaded', 'skipped'
+    )
+
     def __init__(self) -> None:
         self.last_frame: bScoreFrame | None = None
         self.player: Player | None = None
@@ -97,6 +104,14 @@ class StartingTimers:
     thread: Thread
 
 class Match:
+    __slots__ = (
+        'id', 'name', 'password', 'host', 'beatmap_id', 'beatmap_name',
+        'beatmap_hash', 'previous_beatmap_id', 'previous_beatmap_name',
+        'previous_beatmap_hash', 'mods', 'mode', 'seed', 'type', 'scoring_type',
+        'team_type', 'freemod', 'in_progress', 'slots', 'banned_players',
+        'starting', 'completion_timer', 'db_match', 'chat', 'logger', 'last_activity'
+    )
+
     def __init__(
         self,
         id: int,
@@ -140,7 +155,7 @@ class Match:
         self.db_match: DBMatch | None = None
         self.chat: Channel | None = None
 
-        self.logger = logging.getLogger(f'multi_{self.id}')
+        self.logger = ContextLogger(logger.matches, f'multi_{self.id}')
         self.last_activity = time.time()
 
     @classmethod
@@ -262,23 +277,32 @@ class Match:
         return None
 
     def update(self, lobby=True) -> None:
+        bancho_match = self.bancho_match
+
         # Enqueue to our players
-        for player in self.players:
-            player.enqueue_match(
-                self.bancho_match,
+        app.session.players.broadcast(
+            lambda player: player.enqueue_match(
+                bancho_match,
                 send_password=True,
                 update=True
-            )
+            ),
+            players=self.players
+        )
 
         if not lobby:
             return
 
+        # The password gets removed for lobby players
+        bancho_match = self.bancho_match
+
         # Enqueue to lobby players
-        for player in app.session.players.in_lobby:
-            player.enqueue_match(
-                self.bancho_match,
+        app.session.players.broadcast(
+            lambda player: player.enqueue_match(
+                bancho_match,
                 update=True
-            )
+            ),
+            players=app.session.players.in_lobby
+        )
 
     def unready_players(self, expected = SlotStatus.Ready):
         for slot in self.slots:
@@ -469,8 +493,10 @@ class Match:
             player.enqueue_match_disband(self.id)
             player.match = None
 
-        for player in app.session.players.in_lobby:
-            player.enqueue_match_disband(self.id)
+        app.session.players.broadcast(
+            lambda player: player.enqueue_match_disband(self.id),
+            players=app.session.players.in_lobby
+        )
 
         app.session.channels.remove(self.chat)
 
@@ -700,11 +726,16 @@ class Match:
     def process_score_update(self, scoreframe: bScoreFrame) -> None:
         self.last_activity = time.time()
 
-        for p in self.players:
-            p.enqueue_score_update(scoreframe)
+        app.session.players.broadcast(
+            lambda p: p.enqueue_score_update(scoreframe),
+            players=self.players
+        )
 
-        for p in app.session.players.in_lobby:
-            p.enqueue_score_update(scoreframe)
+        app.session.players.broadcast(
+            lambda p: p.enqueue_score_update(scoreframe),
+            players=app.session.players.in_lobby,
+            skip_congested=True
+        )
 
     def start_finish_timeout(self) -> None:
         if self.completion_timer:
@@ -23,7 +23,6 @@ from app.common.objects import (
 
 from app.common.constants import strings, level
 from app.common.cache import leaderboards
-from app.common.cache import usercount
 from app.common.cache import status
 from app.common import officer
 
@@ -41,15 +40,23 @@ from app.common.database.repositories import (
 from app.common.helpers import clients as client_utils
 from app.common.streams import StreamIn, StreamOut
 from app.common.database import DBUser, DBStats
+from app.objects.user import UserSnapshot, stats_by_mode
 from app.objects import OsuClient, Status
+from app.logger import ContextLogger
+from app.executor import PacketExecutor
+from app import logger
+from app.permissions import Groups
 from app.common import mail
 
+from twisted.internet.base import DelayedCall
 from twisted.internet.error import ConnectionDone
+from twisted.internet import reactor, threads
 from twisted.python.failure import Failure
 
-from typing import Callable, List, Dict, Set
+from typing import Callable, FrozenSet, Hashable, List, Dict, Set, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func
 from enum import Enum
 from copy import copy
 
@@ -60,26 +67,43 @@ from app.clients import (
 )
 
 import itertools
+import threading
 import hashlib
 import timeago
-import logging
 import config
-import bcrypt
 import time
+import math
 import gzip
 import app
 
+# Packets, that are currently being captured by this thread
+packet_capture = threading.local()
+
+# Used for lazily creating the spectator collection & channel
+spectator_lock = threading.Lock()
+
 class Player:
+    __slots__ = (
+        'logger', 'protocol', 'address', 'port', 'stats', 'away_message',
+        'client', 'object', 'status', 'id', 'name', 'packets', 'request_packets',
+        'decoders', 'encoders', 'channels', 'filter', 'filter_received',
+        'friend_ids', '_spectators', 'spectating', '_spectator_chat', 'in_lobby',
+        'logged_in', 'match', 'executor', 'last_response', 'congested_since',
+        'packet_cache', 'resume_ticket', 'recent_message_count',
+        'last_minute_stamp', 'silence_end', 'restricted_until', 'silence_timer',
+        'permissions', 'group_flags', 'groups'
+    )
+
     def __init__(self, address: str, port: int) -> None:
-        self.logger = logging.getLogger(address)
+        self.logger = ContextLogger(logger.players, address)
         self.protocol = ''
         self.address = address
         self.port = port
 
-        self.stats:  List[DBStats] | None = None
+        self.stats: List[DBStats | None] = []
         self.away_message: str | None = None
         self.client: OsuClient | None = None
-        self.object: DBUser | None = None
+        self.object: UserSnapshot | None = None
         self.status = Status()
 
         self.id = 0
@@ -96,21 +120,34 @@ class Player:
 
         self.channels: Set[Channel] = set()
         self.filter = PresenceFilter.All
+        self.filter_received = False
+        self.friend_ids: Set[int] = set()
 
-        self.spectators = Players()
+        # Most players are never spectated, so these are created on first use
+        self._spectators: Players | None = None
+        self._spectator_chat: Channel | None = None
         self.spectating: Player | None = None
-        self.spectator_chat: Channel | None = None
 
         self.in_lobby = False
         self.logged_in = False
         self.match: Match | None = None
+        self.executor = PacketExecutor(self)
         self.last_response = time.time()
+        self.congested_since: float | None = None
+        self.packet_cache: Dict[Hashable, bytes] = {}
+        self.resume_ticket: str | None = None
 
         self.recent_message_count = 0
         self.last_minute_stamp = time.time()
 
+        # Unix timestamps, resolved once on login
+        self.silence_end: float = 0
+        self.restricted_until: float = 0
+        self.silence_timer: DelayedCall | None = None
+
         self.permissions = Permissions.NoPermissions
-        self.groups = []
+        self.group_flags = Groups.NoGroup
+        self.groups: FrozenSet[str] = frozenset()
 
     def __repr__(self) -> str:
         return f'<Player "{self.name}" ({self.id})>'
@@ -130,22 +167,55 @@ class Player:
     def bot_player(cls):
         with app.session.database.managed_session() as session:
             player = Player('127.0.0.1', 6969)
-            player.object = users.fetch_by_id(1, session=session)
+            user = users.fetch_by_id(1, session=session)
+            player.object = UserSnapshot.from_user(user)
             player.client = OsuClient.empty()
 
             player.id = -player.object.id
             player.name = player.object.name
-            player.stats  = player.object.stats
+            player.stats = stats_by_mode(user.stats)
 
-            player.permissions = Permissions(
-                groups.get_player_permissions(1, session=session)
-            )
+            player.permissions = app.permissions.fetch(1, session).permissions
 
             player.client.ip.country_code = "OC"
             player.client.ip.city = "w00t p00t!"
 
             return player
 
+    @property
+    def spectators(self) -> "Players":
+        if self._spectators is not None:
+            return self._spectators
+
+        from .collections import Players
+
+        with spectator_lock:
+            if self._spectators is None:
+                self._spectators = Players()
+
+            return self._spectators
+
+    @property
+    def spectator_chat(self) -> "Channel":
+        if self._spectator_chat is not None:
+            return self._spectator_chat
+
+        from .channel import Channel
+
+        with spectator_lock:
+            if self._spectator_chat is None:
+                self._spectator_chat = Channel(
+                    name=f'#spec_{self.id}',
+                    topic=f"{self.name}'s spectator channel",
+                    owner=self.name,
+                    read_perms=1,
+                    write_perms=1,
+                    public=False
+                )
+                app.session.channels.append(self._spectator_chat)
+
+            return self._spectator_chat
+
     @property
     def is_bot(self) -> bool:
         return (
@@ -155,69 +225,53 @@ class Player:
 
     @property
     def silenced(self) -> bool:
-        if not self.object.silence_end:
-            return False
-
-        if self.remaining_silence < 0:
-            # User is not silenced anymore
-            self.unsilence()
-            return False
-
-        return True
+        return self.silence_end > time.time()
 
     @property
     def remaining_silence(self) -> int:
-        if not self.object.silence_end:
-            return 0
-
-        return (
-            self.object.silence_end.timestamp() -
-            datetime.now().timestamp()
-        )
+        return max(self.silence_end - time.time(), 0)
 
     @property
     def restricted(self) -> bool:
-        if not self.object:
+        if self.restricted_until <= 0:
             return False
 
-        if not self.object.restricted:
-            return False
-
-        if not (recent := infringements.fetch_recent_by_action(self.id, action=0)):
-            self.unrestrict()
-            return False
-
-        if recent.is_permanent:
+        if self.restricted_until > time.time():
             return True
-        
-        if not recent.length:
-            return True
-
-        remaining = (recent.length - datetime.now()).total_seconds()
 
-        if remaining <= 0:
-            self.unrestrict()
-            return False
-
-        return True
+        # Restriction has expired
+        self.unrestrict()
+        return False
 
     @property
     def current_stats(self) -> DBStats | None:
-        return next(
-            (
-                stats for stats in self.stats
-                if stats.mode == self.status.mode.value
-            ),
-            None
-        )
+        mode = self.status.mode.value
+
+        if mode >= len(self.stats):
+            return None
+
+        return self.stats[mode]
 
     @property
     def friends(self) -> List[int]:
-        return [
-            rel.target_id
-            for rel in self.object.relationships
-            if rel.status == 0
-        ]
+        return list(self.object.friends)
+
+    @property
+    def friendonly_dms(self) -> bool:
+        return self.client.friendonly_dms
+
+    def receives_updates_from(self, player: "Player") -> bool:
+        """Whether the presence filter of this client allows updates about the player"""
+        if player.id == self.id:
+            return True
+
+        if self.filter.value <= 0:
+            return False
+
+        if self.filter == PresenceFilter.All:
+            return True
+
+        return player.id in self.friend_ids
 
     @property
     def online_friends(self) -> List["Player"]:
@@ -292,39 +346,50 @@ class Player:
 
     @property
     def is_supporter(self) -> bool:
-        return 'Supporter' in self.groups
+        return bool(self.group_flags & Groups.Supporter)
 
     @property
     def is_admin(self) -> bool:
-        return 'Admins' in self.groups
+        return bool(self.group_flags & Groups.Admins)
 
     @property
     def is_dev(self) -> bool:
-        return 'Developers' in self.groups
+        return bool(self.group_flags & Groups.Developers)
 
     @property
     def is_bat(self) -> bool:
-        return 'Beatmap Approval Team' in self.groups
+        return bool(self.group_flags & Groups.BeatmapApprovalTeam)
 
     @property
     def is_moderator(self) -> bool:
-        return 'Global Moderator Team' in self.groups
+        return bool(self.group_flags & Groups.GlobalModeratorTeam)
 
     @property
     def has_preview_access(self) -> bool:
-        return 'Preview' in self.groups
+        return bool(self.group_flags & Groups.Preview)
 
     @property
     def is_staff(self) -> bool:
-        return any([self.is_admin, self.is_dev, self.is_moderator])
+        return bool(self.group_flags & Groups.Staff)
     
     @property
     def is_verified(self) -> bool:
         return self.object.is_verified
 
-    def enqueue(self, data: bytes):
+    @property
+    def buffer_depth(self) -> int:
+        """Amount of bytes, that are waiting to be sent to the client"""
+        return 0
+
+    @property
+    def congested(self) -> bool:
+        """Whether the client is too slow to receive non-critical updates"""
+        return self.congested_since is not None
+
+    def enqueue(self, data: bytes, key: Hashable | None = None):
         """
         Enqueues the given data to the client.
+        Packets with the same key may be dropped in favor of newer ones.
         This needs to be implemented by the inheriting class.
         """
         ...
@@ -369,11 +434,15 @@ class Player:
         for channel in copy(self.channels):
             channel.remove(self)
 
-        app.session.channels.remove(self.spectator_chat)
+        if self._spectator_chat is not None:
+            app.session.channels.remove(self._spectator_chat)
         app.session.players.remove(self)
 
+        # Cancels the silence timer, since the player is offline now
+        reactor.callFromThread(self.schedule_silence_expiry)
+
         status.delete(self.id)
-        usercount.set(len(app.session.players.normal_clients))
+        app.workers.update_usercount(app.session.players.normal_count)
 
         if self.match:
             app.clients.handler.leave_match(self)
@@ -381,6 +450,7 @@ class Player:
         tourney_clients = app.session.players.get_all_tourney_clients(self.id)
 
         if len(tourney_clients) <= 0:
+            app.routing.publish_quit(self)
             app.session.players.send_user_quit(
                 bUserQuit(
                     self.id,
@@ -390,31 +460,87 @@ class Player:
                 )
             )
 
-    def send_packet(self, packet: Enum, *args) -> None:
+    def send_packet(self, packet: Enum, *args, key: Hashable | None = None) -> None:
         try:
-            stream = StreamOut()
-            data = self.encoders[packet](*args)
+            data = self.encode_packet(packet, *args)
 
             self.logger.debug(
                 f'<- "{packet.name}": {str(list(args)).removeprefix("[").removesuffix("]")}'
             )
 
-            if self.client.version.date <= 323:
-                # In version b323 and below, the
-                # compression is enabled by default
-                data = gzip.compress(data)
-                stream.legacy_header(packet, len(data))
-            else:
-                stream.header(packet, len(data))
+            self.send_data(
+                data,
+                (packet, key) if key is not None else None
+            )
+        except Exception as e:
+            self.logger.error(
+                f'Could not send packet "{packet.name}": {e}',
+                exc_info=e
+            )
+
+    def send_cached_packet(
+        self,
+        player: "Player",
+        name: Hashable,
+        packet: Enum,
+        arguments: Callable[[], tuple]
+    ) -> None:
+        """Send a packet about another player, which is cached per client version of the receiver"""
+        try:
+            # The cache may get replaced while encoding, in which case
+            # the stale packet only ends up inside the discarded cache
+            cache = player.packet_cache
+            cache_key = (name, self.client.version.date, id(self.encoders))
 
-            stream.write(data)
-            self.enqueue(stream.get())
+            if (data := cache.get(cache_key)) is None:
+                data = cache[cache_key] = self.encode_packet(packet, *arguments())
+
+            self.logger.debug(f'<- "{packet.name}": {player} (cached)')
+            self.send_data(data, (packet, player.id))
         except Exception as e:
             self.logger.error(
                 f'Could not send packet "{packet.name}": {e}',
                 exc_info=e
             )
 
+    def encode_packet(self, packet: Enum, *args) -> bytes:
+        stream = StreamOut()
+        data = self.encoders[packet](*args)
+
+        if self.client.version.date <= 323:
+            # In version b323 and below, the
+            # compression is enabled by default
+            data = gzip.compress(data)
+            stream.legacy_header(packet, len(data))
+        else:
+            stream.header(packet, len(data))
+
+        stream.write(data)
+        return stream.get()
+
+    def send_data(self, data: bytes, key: Hashable | None = None) -> None:
+        capture = getattr(packet_capture, 'current', None)
+
+        if capture and capture[0] is self:
+            # Packets are being captured for a broadcast
+            capture[1].append((data, key))
+            return
+
+        self.enqueue(data, key)
+
+    def capture_packets(self, action: Callable[["Player"], None]) -> List[Tuple[bytes, Hashable | None]]:
+        """Run the action for this player and return the encoded packets, instead of enqueueing them"""
+        packets = []
+        previous = getattr(packet_capture, 'current', None)
+        packet_capture.current = (self, packets)
+
+        try:
+            action(self)
+        finally:
+            packet_capture.current = previous
+
+        return packets
+
     def send_error(self, reason=-5, message=""):
         """This will send a login reply packet with an optional message to the player"""
         if self.encoders and message:
@@ -444,20 +570,19 @@ class Player:
         self.send_error(reason.value, message)
         self.close_connection()
 
-    def reload_object(self) -> DBUser:
+    def reload_object(self) -> UserSnapshot:
         """Reload player object from database"""
         with app.session.database.managed_session() as session:
-            self.object = users.fetch_by_id(self.id, session=session)
-            self.stats = self.object.stats
-
-            # Preload relationships
-            self.object.target_relationships
-            self.object.relationships
-            self.object.groups
+            user = users.fetch_by_id(self.id, session=session)
+            self.object = UserSnapshot.from_user(user)
+            self.stats = stats_by_mode(user.stats)
+            self.friend_ids = set(self.object.friends)
 
+            self.update_silence(self.object.silence_end)
             self.update_leaderboard_stats()
             self.update_status_cache()
             self.reload_rank()
+            self.clear_packet_cache()
 
             return self.object
 
@@ -467,6 +592,7 @@ class Player:
 
         if cached_rank != self.current_stats.rank:
             self.current_stats.rank = cached_rank
+            self.clear_packet_cache()
 
             # Update rank in database
             stats.update(
@@ -481,6 +607,75 @@ class Player:
                 self.object.country
             )
 
+    def load_restriction(self) -> None:
+        """Resolve the end of the restriction, which only requires a lookup for restricted users"""
+        self.restricted_until = 0
+
+        if not self.object.restricted:
+            return
+
+        if not (recent := infringements.fetch_recent_by_action(self.id, action=0)):
+            self.unrestrict()
+            return
+
+        if recent.is_permanent or not recent.length:
+            self.restricted_until = math.inf
+            return
+
+        self.restricted_until = recent.length.timestamp()
+
+    def update_silence(self, silence_end: datetime | None) -> None:
+        """Update the silence of this player, and schedule its expiry"""
+        self.silence_end = silence_end.timestamp() if silence_end else 0
+        reactor.callFromThread(self.schedule_silence_expiry)
+
+    def schedule_silence_expiry(self) -> None:
+        """
+        (Re)schedule the silence timer, if the player is online.
+        This needs to be called from the reactor thread.
+        """
+        if self.silence_timer and self.silence_timer.active():
+            self.silence_timer.cancel()
+
+        self.silence_timer = None
+
+        if self not in app.session.players:
+            return
+
+        if (remaining := self.remaining_silence) <= 0:
+            return
+
+        self.silence_timer = reactor.callLater(
+            remaining,
+            threads.deferToThread,
+            self.silence_expired
+        )
+
+    def silence_expired(self) -> None:
+        if not self.logged_in or self not in app.session.players:
+            # Player has disconnected in the meantime
+            return
+
+        if self.silenced or not self.silence_end:
+            # Silence was extended or removed in the meantime
+            return
+
+        self.unsilence()
+
+    def reload_groups(self, session: Session | None = None) -> None:
+        """Update the groups & permissions of this player from the cache"""
+        entry = app.permissions.fetch(self.id, session)
+        self.permissions = entry.permissions
+        self.group_flags = entry.flags
+        self.groups = entry.names
+
+        # Presence packets contain the permissions
+        self.clear_packet_cache()
+
+    def clear_packet_cache(self) -> None:
+        """Clear the cached presence & stats packets of this player"""
+        self.packet_cache = {}
+
     def update_leaderboard_stats(self) -> None:
         """Updates the player's stats inside the redis leaderboard"""
         leaderboards.update(
@@ -509,14 +704,24 @@ class Player:
         self.logger.debug(f'Assigned decoder with version b{client_version.version}')
 
     def login_received(self, username: str, md5: str, client: OsuClient):
-        self.logger = logging.getLogger(f'Player "{username}"')
+        self.logger = ContextLogger(logger.players, f'Player "{username}"')
         self.logger.info(f'Login attempt as "{username}" with {client.version}.')
         self.last_response = time.time()
         self.client = client
 
         # Get decoders and encoders
         self.get_client(client.version.date)
+        self.process_login(username, md5, client)
+
+    def login_rejected(self, client: OsuClient) -> None:
+        """Let the client retry later, to spread out reconnect storms"""
+        self.client = client
+        self.get_client(client.version.date)
+        self.logger.warning('Login Failed: Server is at capacity')
+        self.enqueue_server_restart(app.admission.retry_delay())
+        self.close_connection()
 
+    def process_login(self, username: str, md5: str, client: OsuClient):
         # Send protocol version
         self.send_packet(self.packets.PROTOCOL_VERSION, config.PROTOCOL_VERSION)
 
@@ -530,29 +735,40 @@ class Player:
                 return
 
         with app.session.database.managed_session() as session:
-            if not (user := users.fetch_by_name_case_insensitive(username, session)):
+            if not (user := self.fetch_user(username, session)):
                 self.logger.warning('Login Failed: User not found')
                 self.login_failed(LoginError.Authentication)
                 return
 
             self.id = user.id
             self.name = user.name
-            self.stats = user.stats
-            self.object = user
+            self.stats = stats_by_mode(user.stats)
+            self.object = UserSnapshot.from_user(user)
 
-            self.permissions = Permissions(groups.get_player_permissions(self.id, session))
-            self.groups = [group.name for group in groups.fetch_user_groups(self.id, True, session)]
+            # Sessions from before a restart skip the password & client checks
+            resumed = app.resume.load(self, md5, user.bcrypt)
 
-            # Preload relationships
-            self.object.target_relationships
-            self.object.relationships
-            self.object.groups
+            # Check the password in the background, while fetching the groups
+            verification = (
+                app.credentials.submit(user.id, md5, user.bcrypt)
+                if not resumed else None
+            )
+
+            self.reload_groups(session)
+            self.friend_ids = set(self.object.friends)
 
-            if not bcrypt.checkpw(md5.encode(), user.bcrypt.encode()):
+            # On a cache miss this thread waits for the bcrypt check. The logins
+            # are bounded by LOGIN_CONCURRENCY, and http logins need the result
+            # before the response can be written, so this wait is accepted here
+            if verification and not verification.result():
                 self.logger.warning('Login Failed: Authentication error')
                 self.login_failed(LoginError.Authentication)
                 return
 
+            self.resume_ticket = app.resume.issue_ticket(user.id, md5, user.bcrypt)
+            self.load_restriction()
+            self.update_silence(user.silence_end)
+
             if self.restricted:
                 self.logger.warning('Login Failed: Restricted')
                 self.login_failed(LoginError.Banned)
@@ -582,7 +798,7 @@ class Player:
             )
 
             # Check client's executable hash
-            if check_client:
+            if check_client and not resumed:
                 is_valid = client_utils.is_valid_client_hash(
                     self.client.version.date,
                     self.client.hash.md5
@@ -630,6 +846,33 @@ class Player:
                 self.reload_object()
                 self.enqueue_silence_info(-1)
 
+            # Update cache
+            self.update_status_cache()
+
+        self.logged_in = True
+        self.login_success()
+
+        if resumed:
+            app.resume.restore(self, resumed)
+
+        # The client doesn't need to wait for these
+        app.writer.submit(self.login_writes, check_hardware=not resumed)
+
+    def fetch_user(self, username: str, session: Session) -> DBUser | None:
+        """Fetch a user with all relationships, that are needed for the login"""
+        # Users only have a few stats rows, which can be joined
+        # directly, while the relationships are fetched in bulk
+        return session.query(DBUser) \
+            .options(
+                joinedload(DBUser.stats),
+                selectinload(DBUser.relationships)
+            ) \
+            .filter(func.lower(DBUser.name) == username.lower()) \
+            .first()
+
+    def login_writes(self, check_hardware: bool = True) -> None:
+        """Write the login attempt, hardware & leaderboard data of a successful login"""
+        with app.session.database.managed_session() as session:
             # Create login attempt in db
             logins.create(
                 self.id,
@@ -638,35 +881,19 @@ class Player:
                 session
             )
 
-            # Check for new hardware
-            self.check_client(session)
+            if check_hardware:
+                # Check for new hardware
+                self.check_client(session)
 
             if self.object.country.upper() == 'XX':
                 # We failed to get the users country on registration
-                self.object.country = self.client.ip.country_code.upper()
+                self.object = self.object._replace(country=self.client.ip.country_code.upper())
                 leaderboards.remove_country(self.id, self.object.country)
                 users.update(self.id, {'country': self.object.country}, session)
 
-            # Update cache
-            self.update_leaderboard_stats()
-            self.update_status_cache()
-
-        self.logged_in = True
-        self.login_success()
+        self.update_leaderboard_stats()
 
     def login_success(self):
-        from .channel import Channel
-
-        self.spectator_chat = Channel(
-            name=f'#spec_{self.id}',
-            topic=f"{self.name}'s spectator channel",
-            owner=self.name,
-            read_perms=1,
-            write_perms=1,
-            public=False
-        )
-        app.session.channels.append(self.spectator_chat)
-
         self.update_activity()
         self.send_packet(self.packets.LOGIN_REPLY, self.id)
 
@@ -687,12 +914,19 @@ class Player:
 
         # Append to player collection
         app.session.players.add(self)
+        reactor.callFromThread(self.schedule_silence_expiry)
 
         # Enqueue other players
         self.enqueue_players(app.session.players)
 
+        if app.routing.remote_players:
+            # Enqueue players of other nodes
+            self.enqueue_players(list(app.routing.remote_players.values()))
+
+        app.routing.publish_presence(self)
+
         # Update usercount
-        usercount.set(len(app.session.players.normal_clients))
+        app.workers.update_usercount(app.session.players.normal_count)
 
         # Enqueue all public channels
         for channel in app.session.channels.public:
@@ -749,7 +983,7 @@ class Player:
 
             if self.current_stats.playcount > 0 and not user_matches:
                 mail.send_new_location_email(
-                    self.object,
+                    users.fetch_by_id(self.id, session=session),
                     self.client.ip.country_name
                 )
 
@@ -783,6 +1017,11 @@ class Player:
             app.session.redis.set(f'multiaccounting:{self.id}', 1)
             self.enqueue_announcement(strings.MULTIACCOUNTING_DETECTED)
 
+    def packets_received(self, packets: List[Tuple[int, StreamIn]]):
+        """Handle a batch of packets, in the order they were received"""
+        for packet_id, stream in packets:
+            self.packet_received(packet_id, stream)
+
     def packet_received(self, packet_id: int, stream: StreamIn):
         self.last_response = time.time()
 
@@ -827,17 +1066,21 @@ class Player:
 
         duration = timedelta(seconds=duration_sec)
 
-        if not self.object.silence_end:
-            self.object.silence_end = datetime.now() + duration
+        if not self.silenced:
+            silence_end = datetime.now() + duration
         else:
             # Append duration, if user has been silenced already
-            self.object.silence_end += duration
+            silence_end = self.object.silence_end + duration
+
+        self.object = self.object._replace(silence_end=silence_end)
+        self.update_silence(silence_end)
 
         # Update database
         users.update(self.id, {'silence_end': self.object.silence_end})
 
         # Enqueue to client
         self.enqueue_silence_info(duration_sec)
+        app.routing.publish_stats(self)
 
         # Add entry inside infringements table
         infringements.create(
@@ -852,8 +1095,10 @@ class Player:
         )
 
     def unsilence(self):
-        self.object.silence_end = None
+        self.object = self.object._replace(silence_end=None)
+        self.update_silence(None)
         self.enqueue_silence_info(0)
+        app.routing.publish_stats(self)
 
         # Update database
         users.update(self.id, {'silence_end': None})
@@ -867,7 +1112,8 @@ class Player:
         until: datetime | None = None,
         autoban: bool = False
     ) -> None:
-        self.object.restricted = True
+        self.object = self.object._replace(restricted=True)
+        self.restricted_until = until.timestamp() if until else math.inf
 
         # Update database
         users.update(self.id, {'restricted': True})
@@ -875,6 +1121,7 @@ class Player:
         # Remove permissions
         groups.delete_entry(self.id, 999)
         groups.delete_entry(self.id, 1000)
+        app.permissions.changed(self.id)
 
         # Update leaderboards
         leaderboards.remove(
@@ -922,11 +1169,13 @@ class Player:
 
     def unrestrict(self) -> None:
         users.update(self.id, {'restricted': False})
-        self.object.restricted = False
+        self.object = self.object._replace(restricted=False)
+        self.restricted_until = 0
 
         # Add to player & supporter group
         groups.create_entry(self.id, 999)
         groups.create_entry(self.id, 1000)
+        app.permissions.changed(self.id)
 
         # Update hardware
         clients.update_all(self.id, {'banned': False})
@@ -1023,57 +1272,69 @@ class Player:
 
     def enqueue_presence(self, player: "Player", update: bool = False):
         if self.client.version.date <= 319:
-            self.send_packet(
+            self.send_cached_packet(
+                player,
+                ('presence', update),
                 self.packets.USER_STATS,
-                player.user_stats,
-                player.user_presence,
-                update
+                lambda: (player.user_stats, player.user_presence, update)
             )
             return
 
         if self.client.version.date <= 1710:
-            self.send_packet(
+            self.send_cached_packet(
+                player,
+                'presence',
                 self.packets.USER_STATS,
-                player.user_stats,
-                player.user_presence
+                lambda: (player.user_stats, player.user_presence)
             )
             return
 
-        presence = player.user_presence
+        def arguments():
+            presence = player.user_presence
 
-        if (
-            self.client.version.date > 833 and
-            player.current_stats.pp <= 0
-        ):
-            # Newer clients don't display rank 0
-            presence.rank = 0
+            if (
+                self.client.version.date > 833 and
+                player.current_stats.pp <= 0
+            ):
+                # Newer clients don't display rank 0
+                presence.rank = 0
 
-        self.send_packet(
+            return (presence,)
+
+        self.send_cached_packet(
+            player,
+            'presence',
             self.packets.USER_PRESENCE,
-            presence
+            arguments
         )
 
     def enqueue_stats(self, player: "Player"):
         if self.client.version.date <= 319:
-            self.send_packet(
+            self.send_cached_packet(
+                player,
+                'stats',
                 self.packets.USER_STATS,
-                player.user_stats,
-                player.user_presence
+                lambda: (player.user_stats, player.user_presence)
             )
             return
 
-        stats = player.user_stats
+        def arguments():
+            stats = player.user_stats
 
-        if (
-            self.client.version.date > 833 and
-            stats.pp <= 0
-        ):
-            # Newer clients don't display rank 0
-            stats.rank = 0
+            if (
+                self.client.version.date > 833 and
+                stats.pp <= 0
+            ):
+                # Newer clients don't display rank 0
+                stats.rank = 0
 
-        self.send_packet(
+            return (stats,)
+
+        self.send_cached_packet(
+            player,
+            'stats',
             self.packets.USER_STATS,
-            stats
+            arguments
         )
 
     def enqueue_quit(self, user_quit: bUserQuit):
@@ -1098,7 +1359,8 @@ class Player:
         self.send_packet(
             self.packets.CHANNEL_AVAILABLE if not autojoin else \
             self.packets.CHANNEL_AVAILABLE_AUTOJOIN,
-            channel
+            channel,
+            key=channel.name if not autojoin else None
         )
 
     def join_success(self, name: str):
@@ -1234,7 +1496,8 @@ class Player:
         self.send_packet(
             self.packets.UPDATE_MATCH if update else \
             self.packets.NEW_MATCH,
-            match
+            match,
+            key=match.id if update else None
         )
 
     def enqueue_match_start(self, match: bMatch):
@@ -0,0 +1,52 @@
+
+from __future__ import annotations
+
+from app.common.database import DBUser, DBStats
+from typing import FrozenSet, List, NamedTuple
+from datetime import datetime
+
+class UserSnapshot(NamedTuple):
+    """Immutable copy of the user fields, that are used while a player is online"""
+    id: int
+    name: str
+    country: str
+    silence_end: datetime | None
+    restricted: bool
+    activated: bool
+    preferred_mode: int
+    discord_id: int | None
+    is_bot: bool
+    is_verified: bool
+    friends: FrozenSet[int]
+
+    @classmethod
+    def from_user(cls, user: DBUser) -> UserSnapshot:
+        return cls(
+            user.id,
+            user.name,
+            user.country,
+            user.silence_end,
+            user.restricted,
+            user.activated,
+            user.preferred_mode,
+            user.discord_id,
+            user.is_bot,
+            user.is_verified,
+            frozenset(
+                rel.target_id
+                for rel in user.relationships
+                if rel.status == 0
+            )
+        )
+
+def stats_by_mode(stats: List[DBStats]) -> List[DBStats | None]:
+    """Arrange the stats of a user, so that they can be indexed by their mode"""
+    if not stats:
+        return []
+
+    result: List[DBStats | None] = [None] * (max(s.mode for s in stats) + 1)
+
+    for entry in stats:
+        result[entry.mode] = entry
+
+    return result
@@ -0,0 +1,99 @@
+
+from app.common.database.repositories import groups
+from app.common.constants import Permissions
+from typing import Dict, FrozenSet, NamedTuple, Tuple
+from sqlalchemy.orm import Session
+from enum import IntFlag
+
+import threading
+import config
+import time
+import app
+
+class Groups(IntFlag):
+    NoGroup = 0
+    Admins = 1 << 0
+    Developers = 1 << 1
+    BeatmapApprovalTeam = 1 << 2
+    GlobalModeratorTeam = 1 << 3
+    TournamentManagerTeam = 1 << 4
+    Supporter = 1 << 5
+    Preview = 1 << 6
+
+    Staff = Admins | Developers | GlobalModeratorTeam
+    ModeratedChat = (
+        Admins | Developers | BeatmapApprovalTeam |
+        GlobalModeratorTeam | TournamentManagerTeam
+    )
+
+GROUP_FLAGS = {
+    'Admins': Groups.Admins,
+    'Developers': Groups.Developers,
+    'Beatmap Approval Team': Groups.BeatmapApprovalTeam,
+    'Global Moderator Team': Groups.GlobalModeratorTeam,
+    'Tournament Manager Team': Groups.TournamentManagerTeam,
+    'Supporter': Groups.Supporter,
+    'Preview': Groups.Preview
+}
+
+class GroupEntry(NamedTuple):
+    names: FrozenSet[str]
+    flags: Groups
+    permissions: Permissions
+
+cache: Dict[int, Tuple[float, GroupEntry]] = {}
+lock = threading.Lock()
+
+# Incremented on every invalidation of a user, so that fetches
+# which started before it don't store their outdated result
+generations: Dict[int, int] = {}
+
+def fetch(user_id: int, session: Session | None = None) -> GroupEntry:
+    """Get the groups & permissions of a user, which are cached until they change or expire"""
+    if (cached := cache.get(user_id)) is not None:
+        expiry, entry = cached
+
+        if expiry > time.monotonic():
+            app.session.metrics.counter('permissions.cached').increment()
+            return entry
+
+    started = generations.get(user_id, 0)
+
+    names = frozenset(
+        group.name for group in
+        groups.fetch_user_groups(user_id, True, session)
+    )
+
+    flags = Groups.NoGroup
+
+    for name in names:
+        flags |= GROUP_FLAGS.get(name, Groups.NoGroup)
+
+    entry = GroupEntry(
+        names,
+        flags,
+        Permissions(groups.get_player_permissions(user_id, session))
+    )
+
+    now = time.monotonic()
+
+    with lock:
+        if len(cache) > 10000:
+            # Remove entries of users, that went offline
+            for key in [k for k, (expiry, _) in cache.items() if expiry <= now]:
+                del cache[key]
+
+        if started == generations.get(user_id, 0):
+            cache[user_id] = (now + config.PERMISSION_CACHE_TTL, entry)
+
+    return entry
+
+def invalidate(user_id: int) -> None:
+    with lock:
+        generations[user_id] = generations.get(user_id, 0) + 1
+        cache.pop(user_id, None)
+
+def changed(user_id: int) -> None:
+    """Notify all nodes, that the groups of a user have changed"""
+    invalidate(user_id)
+    app.session.events.submit('groups_changed', user_id)
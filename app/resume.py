@@ -0,0 +1,113 @@
+
+from __future__ import annotations
+
+from app.common.constants import PresenceFilter
+from typing import TYPE_CHECKING, Iterable, List, NamedTuple
+
+if TYPE_CHECKING:
+    from app.objects.player import Player
+
+import hashlib
+import config
+import json
+import hmac
+import app
+
+class Snapshot(NamedTuple):
+    user_id: int
+    client_hash: str
+    ticket: str
+    channels: List[str]
+    filter: int
+
+def enabled() -> bool:
+    # The secret needs to survive restarts, so it can't be generated on startup
+    return config.RESUME_GRACE > 0 and bool(config.RESUME_SECRET)
+
+def sign(payload: str) -> str:
+    return hmac.new(
+        config.RESUME_SECRET.encode(),
+        payload.encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+def issue_ticket(user_id: int, md5: str, hashed: str) -> str:
+    """Create a resume ticket for the credentials of a player, after a successful login"""
+    if not enabled():
+        return ""
+
+    return sign(f'{user_id}.{md5}.{hashed}')
+
+def save(players: Iterable[Player]) -> None:
+    """Store the sessions of all players, so that they can be resumed after a restart"""
+    if not enabled():
+        return
+
+    pipeline = app.session.redis.pipeline()
+
+    for player in players:
+        if not player.resume_ticket or player.is_tourney_client:
+            continue
+
+        payload = json.dumps(Snapshot(
+            player.id,
+            player.client.hash.string,
+            player.resume_ticket,
+            [channel.name for channel in player.channels if channel.public],
+            player.filter.value
+        ))
+
+        pipeline.set(
+            f'bancho:resume:{player.id}',
+            f'{sign(payload)}.{payload}',
+            ex=config.RESUME_GRACE
+        )
+
+    pipeline.execute()
+
+def load(player: Player, md5: str, hashed: str) -> Snapshot | None:
+    """Get the stored session of a player, if the credentials & client are the same"""
+    if not enabled():
+        return None
+
+    pipeline = app.session.redis.pipeline()
+    pipeline.get(f'bancho:resume:{player.id}')
+    pipeline.delete(f'bancho:resume:{player.id}')
+    data, _ = pipeline.execute()
+
+    if not data:
+        return None
+
+    signature, _, payload = data.decode().partition('.')
+
+    if not hmac.compare_digest(sign(payload), signature):
+        return None
+
+    snapshot = Snapshot(*json.loads(payload))
+    ticket = issue_ticket(player.id, md5, hashed)
+
+    if not hmac.compare_digest(snapshot.ticket, ticket):
+        return None
+
+    if snapshot.client_hash != player.client.hash.string:
+        return None
+
+    return snapshot
+
+def restore(player: Player, snapshot: Snapshot) -> None:
+    """Rejoin the channels of a resumed session"""
+    app.session.players.set_filter(player, PresenceFilter(snapshot.filter))
+
+    for name in snapshot.channels:
+        if not (channel := app.session.channels.by_name(name)):
+            continue
+
+        if not channel.can_read(player.permissions):
+            continue
+
+        if player in channel.users:
+            continue
+
+        channel.add(player)
+
+    player.logger.info(f'Resumed session with {len(snapshot.channels)} channels')
@@ -0,0 +1,346 @@
+
+from __future__ import annotations
+
+from app.common.objects import bUserPresence, bUserStats, bUserQuit, bMessage
+from app.common.constants import QuitState
+from app.objects.channel import Channel
+from app.objects.player import Player
+from typing import Dict, FrozenSet, List, NamedTuple
+from copy import copy
+
+import threading
+import config
+import time
+import app
+
+class RemoteState(NamedTuple):
+    """Fields of a remote player, that are needed to validate private messages"""
+    silence_end: float
+    away_message: str | None
+    friendonly_dms: bool
+    friends: FrozenSet[int]
+
+class RemotePlayer:
+    """
+    Snapshot of a player, that is connected to another node.
+    This only implements the parts of the player interface, that are
+    needed to send its presence & stats and to message it.
+    """
+
+    __slots__ = ('node', 'id', 'name', 'presence', 'stats_update', 'state', 'packet_cache')
+
+    is_bot = False
+
+    def __init__(self, node: str, name: str, presence: bUserPresence, stats: bUserStats, state: RemoteState) -> None:
+        self.node = node
+        self.name = name
+        self.id = presence.user_id
+        self.update(presence, stats, state)
+
+    def __repr__(self) -> str:
+        return f'<RemotePlayer "{self.name}" ({self.id}) on {self.node}>'
+
+    @property
+    def user_presence(self) -> bUserPresence:
+        # Presence objects may be modified while being sent
+        return copy(self.presence)
+
+    @property
+    def user_stats(self) -> bUserStats:
+        return copy(self.stats_update)
+
+    @property
+    def current_stats(self) -> bUserStats:
+        return self.stats_update
+
+    @property
+    def rank(self) -> int:
+        return self.stats_update.rank
+
+    @property
+    def silence_end(self) -> float:
+        return self.state.silence_end
+
+    @property
+    def silenced(self) -> bool:
+        return self.state.silence_end > time.time()
+
+    @property
+    def away_message(self) -> str | None:
+        return self.state.away_message
+
+    @property
+    def friends(self) -> List[int]:
+        return list(self.state.friends)
+
+    @property
+    def friendonly_dms(self) -> bool:
+        return self.state.friendonly_dms
+
+    def update(self, presence: bUserPresence, stats: bUserStats, state: RemoteState) -> None:
+        self.presence = presence
+        self.stats_update = stats
+        self.state = state
+        self.clear_packet_cache()
+
+    def clear_packet_cache(self) -> None:
+        self.packet_cache = {}
+
+    def enqueue_message(self, message: bMessage) -> None:
+        # Messages get delivered by the node of the player
+        app.session.routes.submit(
+            'private_message',
+            config.NODE_ID,
+            self.id,
+            message.sender,
+            message.sender_id,
+            message.content
+        )
+
+# Players & channel member counts of other nodes
+# These are replaced instead of modified, so that other threads can iterate over them
+remote_players: Dict[int, RemotePlayer] = {}
+remote_names: Dict[str, RemotePlayer] = {}
+remote_members: Dict[str, Dict[str, int]] = {}
+lock = threading.Lock()
+
+def enabled() -> bool:
+    """Whether there are other nodes to route data to"""
+    return bool(config.NODES)
+
+def remote_member_count(channel: Channel) -> int:
+    return sum(remote_members.get(channel.name, {}).values())
+
+def by_name(name: str) -> RemotePlayer | None:
+    return remote_names.get(name.lower())
+
+def add_remote(player: RemotePlayer) -> None:
+    global remote_players, remote_names
+
+    with lock:
+        remote_players = {**remote_players, player.id: player}
+        remote_names = {**remote_names, player.name.lower(): player}
+
+def remove_remote(user_id: int) -> RemotePlayer | None:
+    global remote_players, remote_names
+
+    with lock:
+        if not (player := remote_players.get(user_id)):
+            return None
+
+        remote_players = {
+            id: p for id, p in remote_players.items()
+            if id != user_id
+        }
+        remote_names = {
+            name: p for name, p in remote_names.items()
+            if p is not player
+        }
+
+    return player
+
+def update_members(channel_name: str, node: str, count: int | None) -> None:
+    """Set the member count of a channel on another node, or remove it if count is None"""
+    global remote_members
+
+    with lock:
+        members = {**remote_members.get(channel_name, {}), node: count}
+
+        if count is None:
+            members.pop(node)
+
+        remote_members = {**remote_members, channel_name: members}
+
+def remote_state(player: Player) -> RemoteState:
+    return RemoteState(
+        player.silence_end,
+        player.away_message,
+        player.client.friendonly_dms,
+        frozenset(player.friend_ids)
+    )
+
+def publish_presence(player: Player) -> None:
+    if not enabled() or player.is_bot:
+        return
+
+    app.session.routes.submit(
+        'presence',
+        config.NODE_ID,
+        player.name,
+        player.user_presence,
+        player.user_stats,
+        remote_state(player)
+    )
+
+def publish_stats(player: Player) -> None:
+    if not enabled() or player.is_bot:
+        return
+
+    app.session.routes.submit(
+        'stats',
+        config.NODE_ID,
+        player.name,
+        player.user_presence,
+        player.user_stats,
+        remote_state(player)
+    )
+
+def publish_quit(player: Player) -> None:
+    if not enabled() or player.is_bot:
+        return
+
+    app.session.routes.submit('quit', config.NODE_ID, player.id)
+
+def publish_channel_message(channel: Channel, sender: Player, message: str) -> None:
+    if not enabled() or not channel.public:
+        return
+
+    app.session.routes.submit(
+        'channel_message',
+        config.NODE_ID,
+        channel.name,
+        sender.name,
+        sender.id,
+        message
+    )
+
+def publish_channel_members(channel: Channel) -> None:
+    if not enabled() or not channel.public:
+        return
+
+    app.session.routes.submit(
+        'channel_members',
+        config.NODE_ID,
+        channel.name,
+        len(channel.users)
+    )
+
+def announce_node() -> None:
+    """Let the other nodes know, that this node (re)started"""
+    if enabled():
+        app.session.routes.submit('node_started', config.NODE_ID)
+
+@app.session.routes.register('presence')
+def remote_presence(node: str, name: str, presence: bUserPresence, stats: bUserStats, state: RemoteState):
+    if node == config.NODE_ID:
+        return
+
+    if player := remote_players.get(presence.user_id):
+        player.update(presence, stats, state)
+    else:
+        add_remote(player := RemotePlayer(node, name, presence, stats, state))
+
+    app.session.players.send_presence(player)
+
+@app.session.routes.register('stats')
+def remote_stats(node: str, name: str, presence: bUserPresence, stats: bUserStats, state: RemoteState):
+    if node == config.NODE_ID:
+        return
+
+    if not (player := remote_players.get(presence.user_id)):
+        # We missed the presence of this player
+        add_remote(player := RemotePlayer(node, name, presence, stats, state))
+        app.session.players.send_presence(player)
+        return
+
+    player.update(presence, stats, state)
+    app.session.players.send_stats(player)
+
+@app.session.routes.register('quit')
+def remote_quit(node: str, user_id: int):
+    if node == config.NODE_ID:
+        return
+
+    if not (player := remove_remote(user_id)):
+        return
+
+    if app.session.players.by_id(user_id):
+        # Player has moved to this node
+        return
+
+    app.session.players.send_user_quit(
+        bUserQuit(
+            player.id,
+            player.user_presence,
+            player.user_stats,
+            QuitState.Gone
+        )
+    )
+
+@app.session.routes.register('channel_message')
+def remote_channel_message(node: str, channel_name: str, sender_name: str, sender_id: int, message: str):
+    if node == config.NODE_ID:
+        return
+
+    if not (channel := app.session.channels.by_name(channel_name)):
+        return
+
+    message_object = bMessage(
+        sender_name,
+        message,
+        channel.display_name,
+        sender_id
+    )
+
+    # Exclude clients that only write in #osu if channel was not autojoined
+    channel.users.broadcast(
+        lambda user: user.enqueue_message(message_object),
+        players=[
+            user for user in channel.users
+            if user.client.version.date > 342
+            or channel.name in config.AUTOJOIN_CHANNELS
+        ]
+    )
+
+@app.session.routes.register('channel_members')
+def remote_channel_members(node: str, channel_name: str, count: int):
+    if node == config.NODE_ID:
+        return
+
+    if not (channel := app.session.channels.by_name(channel_name)):
+        return
+
+    update_members(channel_name, node, count)
+    channel.update()
+
+@app.session.routes.register('private_message')
+def remote_private_message(node: str, target_id: int, sender_name: str, sender_id: int, message: str):
+    if node == config.NODE_ID:
+        return
+
+    if not (target := app.session.players.by_id(target_id)):
+        return
+
+    if target.client.friendonly_dms and sender_id not in target.friend_ids:
+        return
+
+    target.enqueue_message(
+        bMessage(
+            sender_name,
+            message,
+            sender_name,
+            sender_id,
+            is_private=True
+        )
+    )
+
+@app.session.routes.register('node_started')
+def node_started(node: str):
+    if node == config.NODE_ID:
+        return
+
+    # Players of the previous run of this node are gone
+    for player in remote_players.values():
+        if player.node == node:
+            remote_quit(node, player.id)
+
+    for channel_name, members in remote_members.items():
+        if node in members:
+            update_members(channel_name, node, None)
+
+    # Send our state to the new node
+    for player in app.session.players:
+        publish_presence(player)
+
+    for channel in app.session.channels.public:
+        publish_channel_members(channel)
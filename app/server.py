@@ -14,6 +14,14 @@ class TcpBanchoFactory(Factory):
 
     def startFactory(self):
         app.session.logger.info(f'Starting factory: {self}')
+        app.session.metrics.gauge(
+            'tcp.buffered_bytes',
+            lambda: sum(p.buffer_depth for p in app.session.players.tcp_clients)
+        )
+        app.session.metrics.gauge(
+            'tcp.congested_clients',
+            lambda: sum(1 for p in app.session.players.tcp_clients if p.congested)
+        )
 
     def stopFactory(self):
         app.session.logger.warning(f'Stopping factory: {self}')
@@ -29,6 +37,18 @@ class HttpBanchoFactory(Site):
 
     def startFactory(self):
         app.session.logger.info(f'Starting factory: {self}')
+        app.session.metrics.gauge(
+            'http.buffered_bytes',
+            lambda: sum(p.buffer_depth for p in app.session.players.http_clients)
+        )
+        app.session.metrics.gauge(
+            'http.compaction_ratio',
+            lambda: round(
+                app.session.metrics.counter('http.superseded').total /
+                max(app.session.metrics.counter('http.packets').total, 1),
+                4
+            )
+        )
 
     def stopFactory(self):
         app.session.logger.warning(f'Stopping factory: {self}')
@@ -4,6 +4,7 @@ from .common.cache.events import EventQueue
 from .clients import DefaultResponsePacket
 from .common.database import Postgres
 from .common.storage import Storage
+from .metrics import Metrics
 from .tasks import Tasks
 
 from typing import Callable, Dict
@@ -30,6 +31,11 @@ events = EventQueue(
     connection=redis
 )
 
+routes = EventQueue(
+    name='bancho:routes',
+    connection=redis
+)
+
 logger = logging.getLogger('bancho')
 bot_player = None
 
@@ -44,4 +50,5 @@ channels = Channels()
 storage = Storage()
 players = Players()
 matches = Matches()
+metrics = Metrics()
 tasks = Tasks()
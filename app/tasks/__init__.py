@@ -6,6 +6,7 @@ from typing import Callable
 from . import activities
 from . import events
 from . import pings
+from . import stats
 
 import logging
 import time
@@ -10,3 +10,20 @@ def event_listener():
 
     for func, args, kwargs in events:
         func(*args, **kwargs)
+
+def route_listener():
+    """This will listen for presence & chat updates of other nodes, and deliver them to local players."""
+    routes = app.session.routes.listen()
+
+    if app.session.tasks._shutdown:
+        exit()
+
+    # Request the state of the other nodes
+    app.routing.announce_node()
+
+    for func, args, kwargs in routes:
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            # A single broken update should not stop the routing
+            app.session.logger.error(f'Failed to process route "{func.__name__}": {e}', exc_info=e)
@@ -1,6 +1,7 @@
 
 from app.common import officer
 
+import config
 import time
 import app
 
@@ -33,6 +34,15 @@ def ping():
         if last_response >= PING_TIMEOUT:
             player.logger.warning('Client timed out.')
             player.close_connection()
+            continue
+
+        # This can be reset by another thread at any time
+        if (congested_since := player.congested_since) is None:
+            continue
+
+        if (time.time() - congested_since) >= config.SLOW_CONSUMER_TIMEOUT:
+            player.logger.warning('Client is not reading its data, disconnecting.')
+            player.close_connection()
 
     for player in app.session.players.http_clients:
         last_response = (time.time() - player.last_response)
@@ -40,6 +50,15 @@ def ping():
         if last_response >= PING_TIMEOUT:
             player.logger.warning('Client timed out.')
             player.close_connection()
+            continue
+
+        # This can be reset by another thread at any time
+        if (congested_since := player.congested_since) is None:
+            continue
+
+        if (time.time() - congested_since) >= config.SLOW_CONSUMER_TIMEOUT:
+            player.logger.warning('Client is not reading its data, disconnecting.')
+            player.close_connection()
 
 def ping_task():
     while True:
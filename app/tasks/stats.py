@@ -0,0 +1,19 @@
+
+from app.common import officer
+
+import config
+import time
+import app
+
+def stats_task():
+    """This task will send out the stats of players, that have changed their status since the last interval."""
+    while True:
+        if app.session.tasks._shutdown:
+            exit()
+
+        try:
+            app.session.players.flush_stats()
+        except Exception as e:
+            officer.call(f'Stats task failed: {e}', exc_info=e)
+
+        time.sleep(config.STATS_INTERVAL / 1000)
@@ -2,34 +2,66 @@
 from __future__ import annotations
 
 from twisted.internet.address import IPv4Address, IPv6Address
+from twisted.internet.interfaces import IPushProducer
 from twisted.internet.error import ConnectionDone
 from twisted.internet.protocol import Protocol
-from twisted.internet import threads, reactor
+from twisted.internet import reactor
 from twisted.python.failure import Failure
+from zope.interface import implementer
+from typing import Hashable
 
 from app.common.helpers import location
-from app.common.streams import StreamIn
+from app.objects.buffer import OutboundBuffer
 from app.objects.player import Player
+from app.framing import PacketFramer
 from app.objects import OsuClient
 
 import config
-import gzip
+import time
+import app
 
 IPAddress = IPv4Address | IPv6Address
 
+@implementer(IPushProducer)
 class TcpBanchoProtocol(Player, Protocol):
     """This class implements the tcp bancho connection."""
 
+    # Twisted assigns the transport, connected & factory attributes,
+    # which would otherwise end up in the instance dict of Protocol
+    __slots__ = (
+        'is_local', 'framer', 'outbound', 'buffer', 'busy', 'paused',
+        'login_pending', 'transport', 'connected', 'factory'
+    )
+
     request_timeout = 20
-    buffer = b""
-    busy = False
 
     def __init__(self, address: IPAddress) -> None:
         super().__init__(address.host, address.port)
+        self.transport = None
+        self.connected = 0
+        self.factory = None
+        self.buffer = b""
+        self.busy = False
+        self.paused = False
+        self.login_pending = True
         self.is_local = location.is_local_ip(address.host)
+        self.framer: PacketFramer | None = None
         self.protocol = 'tcp'
+        self.outbound = OutboundBuffer(
+            'tcp',
+            config.OUTBOUND_MAX_BYTES,
+            config.OUTBOUND_MAX_PACKETS
+        )
+
+    @property
+    def buffer_depth(self) -> int:
+        """Amount of bytes, that are waiting to be written to the transport"""
+        return self.outbound.size
 
     def connectionMade(self):
+        # Get notified when the client stops reading
+        self.transport.registerProducer(self, True)
+
         if not self.is_local or config.DEBUG:
             self.logger.info(
                 f'-> <{self.address}:{self.port}>'
@@ -49,15 +81,57 @@ class TcpBanchoProtocol(Player, Protocol):
                 f'<{self.address}> -> Connection done.'
             )
 
-    def enqueue(self, data: bytes):
+    def enqueue(self, data: bytes, key: Hashable | None = None):
+        was_empty = self.outbound.append(data, key)
+
+        if self.outbound.exceeded and not self.congested_since:
+            # Client is not reading fast enough, stop sending
+            # non-critical updates until the buffer was drained
+            self.logger.warning(
+                f'Outbound buffer exceeded ({len(self.outbound)} packets, {self.outbound.size} bytes)'
+            )
+            self.congested_since = time.time()
+            app.session.metrics.counter('tcp.congestions').increment()
+
+        if not was_empty:
+            # A flush is already scheduled
+            return
+
         try:
-            reactor.callFromThread(self.transport.write, data)
+            reactor.callFromThread(self.flush)
         except Exception as e:
             self.logger.error(
                 f'Could not write to transport layer: {e}',
                 exc_info=e
             )
 
+    def flush(self):
+        """Write everything that was enqueued since the last reactor tick"""
+        if self.paused:
+            # Transport buffer is full, data will
+            # be flushed after the client caught up
+            return
+
+        if not (packets := self.outbound.pop_all()):
+            return
+
+        self.transport.writeSequence(packets)
+        self.congested_since = None
+
+        app.session.metrics.counter('tcp.flushes').increment()
+        app.session.metrics.counter('tcp.packets').increment(len(packets))
+        app.session.metrics.average('tcp.packets_per_flush').record(len(packets))
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+        self.flush()
+
+    def stopProducing(self):
+        self.paused = True
+
     def close_connection(self, error: Exception | None = None):
         if error:
             self.send_error()
@@ -66,12 +140,22 @@ class TcpBanchoProtocol(Player, Protocol):
         reactor.callFromThread(self.transport.loseConnection)
         super().connectionLost(Failure(error or ConnectionDone()))
 
+    def on_login_rejected(self, failure: Failure) -> None:
+        failure.trap(app.admission.LoginRejected)
+        self.login_rejected(self.client)
+
     def dataReceived(self, data: bytes):
         """
         Will handle the initial login request and then switch to
         packetDataReceived to handle bancho packets.
         """
+        if self.framer is not None:
+            self.packetDataReceived(data)
+            return
+
+        self.loginDataReceived(data)
 
+    def loginDataReceived(self, data: bytes):
         if data.startswith(b'GET /'):
             self.handleHttpRequest(data)
             return
@@ -107,15 +191,23 @@ class TcpBanchoProtocol(Player, Protocol):
                 return
 
             # We now expect bancho packets from the client
-            self.dataReceived = self.packetDataReceived
+            # In version b323 and below, the compression is enabled by default
+            self.framer = PacketFramer(
+                legacy=self.client.version.date <= 323
+            )
+            self.framer.feed(self.buffer)
+            self.buffer = b""
 
-            deferred = threads.deferToThread(
+            # Logins wait for a free slot on the reactor, instead of a thread
+            deferred = app.admission.submit(
+                self.address,
                 super().login_received,
                 username.decode(),
                 password.decode(),
                 self.client
             )
 
+            deferred.addErrback(self.on_login_rejected)
             deferred.addErrback(
                 lambda f: (
                     self.logger.error(f'Error on login: {f.getErrorMessage()}', exc_info=f.value),
@@ -134,49 +226,33 @@ class TcpBanchoProtocol(Player, Protocol):
 
     def packetDataReceived(self, data: bytes):
         """Will handle the bancho packets, after the client login was successful."""
-        if self.busy:
-            self.buffer += data
-            return
-
-        try:
-            self.busy = True
-            self.buffer += data
-
-            while self.buffer:
-                stream = StreamIn(self.buffer)
-                packet = stream.u16()
-
-                # In version b323 and below, the
-                # compression is enabled by default
-                compression = True
+        self.framer.feed(data)
 
-                if self.client.version.date > 323:
-                    compression = stream.bool()
-
-                payload = stream.read(stream.u32())
+        if self.login_pending:
+            # Packets stay inside the framer, until the login was processed
+            return
 
-                if compression:
-                    payload = gzip.decompress(payload)
+        self.process_packets()
 
-                # Update buffer
-                self.buffer = stream.readall()
+    def login_success(self):
+        super().login_success()
+        reactor.callFromThread(self.login_processed)
 
-                deferred = threads.deferToThread(
-                    self.packet_received,
-                    packet_id=packet,
-                    stream=StreamIn(payload)
-                )
+    def login_processed(self):
+        # Process the packets, that were received while the login was queued
+        self.login_pending = False
+        self.process_packets()
 
-                deferred.addErrback(
-                    lambda f: (
-                        self.logger.error(f'Error while processing packet: {f.getErrorMessage()}', exc_info=f.value),
-                        self.close_connection(f.value)
-                    )
+    def process_packets(self):
+        try:
+            # Packets will be processed in order, on a single worker thread
+            deferred = self.executor.submit(self.framer)
+            deferred.addErrback(
+                lambda f: (
+                    self.logger.error(f'Error while processing packet: {f.getErrorMessage()}', exc_info=f.value),
+                    self.close_connection(f.value)
                 )
-        except OverflowError:
-            # Wait for more data
-            pass
-
+            )
         except Exception as e:
             self.logger.error(
                 f'Error while receiving packet: {e}',
@@ -184,9 +260,6 @@ class TcpBanchoProtocol(Player, Protocol):
             )
             self.close_connection(e)
 
-        finally:
-            self.busy = False
-
     def handleHttpRequest(self, data: bytes) -> None:
         self.logger.debug(f'Recieved http request: {data}')
         self.enqueue(b'HTTP/1.1 302 Found\r\n')
@@ -0,0 +1,52 @@
+
+from typing import NamedTuple
+
+import hashlib
+import secrets
+import config
+import hmac
+import time
+
+class Token(NamedTuple):
+    user_id: int
+    node: str
+    expiry: int
+
+def sign(payload: str) -> str:
+    return hmac.new(
+        config.TOKEN_SECRET.encode(),
+        payload.encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+def generate(user_id: int, node: str | None = None) -> str:
+    """Create a signed token for a http session on the given node"""
+    node = node or config.NODE_ID
+    expiry = int(time.time()) + config.TOKEN_LIFETIME
+    payload = f'{user_id}.{node}.{expiry}.{secrets.token_hex(8)}'
+    return f'{payload}.{sign(payload)}'
+
+def validate(token: str) -> Token | None:
+    """Check the signature & expiry of a token, without any lookups"""
+    payload, _, signature = token.rpartition('.')
+
+    # Headers may contain non-ascii characters, which can't be compared as strings
+    if not hmac.compare_digest(sign(payload).encode(), signature.encode()):
+        return None
+
+    try:
+        # The node id itself may contain dots
+        user_id, remaining = payload.split('.', 1)
+        node, expiry, _ = remaining.rsplit('.', 2)
+        token = Token(int(user_id), node, int(expiry))
+    except ValueError:
+        return None
+
+    if token.expiry < time.time():
+        return None
+
+    return token
+
+def needs_refresh(token: Token) -> bool:
+    """Whether a token of a live session should be replaced by a new one"""
+    return token.expiry - time.time() < config.TOKEN_LIFETIME / 2
@@ -0,0 +1,112 @@
+
+from app.common.cache import usercount
+from typing import Dict
+
+import subprocess
+import logging
+import socket
+import signal
+import config
+import time
+import sys
+import app
+import os
+
+logger = logging.getLogger('anchor')
+
+def configure(index: int) -> None:
+    """Assign the node id of a worker process, and the urls of its siblings"""
+    base_id = config.NODE_ID
+
+    for worker in range(config.PROCESSES):
+        config.NODES[f'{base_id}-{worker}'] = f'http://127.0.0.1:{private_port(worker)}'
+
+    config.NODE_ID = f'{base_id}-{index}'
+    config.WORKER_INDEX = index
+
+def private_port(index: int) -> int:
+    """Port that only this worker listens on, used to proxy requests to it"""
+    return config.HTTP_PORT + 1 + index
+
+def listen(port: int, factory) -> None:
+    """Listen on a port, that is shared with the other worker processes"""
+    from twisted.internet import reactor
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(('', port))
+    sock.listen(128)
+    sock.setblocking(False)
+
+    # The reactor uses a copy of the file descriptor
+    reactor.adoptStreamPort(sock.fileno(), socket.AF_INET, factory)
+    sock.close()
+
+def update_usercount(count: int) -> None:
+    """Update the usercount, which is shared between all worker processes"""
+    if config.PROCESSES <= 1:
+        usercount.set(count)
+        return
+
+    app.session.redis.hset('bancho:usercount', config.NODE_ID, count)
+
+    usercount.set(sum(
+        int(count)
+        for count in app.session.redis.hvals('bancho:usercount')
+    ))
+
+def supervise(count: int) -> None:
+    """Start the worker processes and restart them, if they exit unexpectedly"""
+    workers: Dict[int, subprocess.Popen] = {}
+    indexes: Dict[int, int] = {}
+    running = True
+
+    def spawn(index: int) -> None:
+        # Workers are started as new interpreters instead of forks, so that
+        # they don't share the reactor, threads & connections of this process
+        process = subprocess.Popen(
+            [sys.executable, *sys.argv],
+            env={
+                **os.environ,
+                'BANCHO_WORKER_INDEX': str(index),
+                'BANCHO_TOKEN_SECRET': config.TOKEN_SECRET
+            },
+            # Signals are forwarded by the supervisor
+            start_new_session=True
+        )
+        workers[process.pid] = process
+        indexes[process.pid] = index
+
+    def stop(signum, frame) -> None:
+        nonlocal running
+        running = False
+
+        for process in workers.values():
+            process.send_signal(signal.SIGINT)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for index in range(count):
+        spawn(index)
+
+    logger.info(f'Started {count} worker processes')
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+
+        if workers.pop(pid, None) is None:
+            continue
+
+        index = indexes.pop(pid)
+
+        if not running:
+            continue
+
+        logger.warning(f'Worker {index} exited with status {status}, restarting...')
+        time.sleep(1)
+        spawn(index)
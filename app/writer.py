@@ -0,0 +1,32 @@
+
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable
+
+import logging
+import config
+import app
+
+logger = logging.getLogger('anchor')
+
+executor = ThreadPoolExecutor(
+    max_workers=config.WRITER_THREADS,
+    thread_name_prefix='writer'
+)
+
+def submit(fn: Callable, *args, **kwargs) -> Future:
+    """Run non-critical writes in the background, outside of the worker threads"""
+    future = executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(callback)
+    return future
+
+def callback(future: Future) -> None:
+    app.session.metrics.counter('writer.completed').increment()
+
+    if e := future.exception():
+        logger.error(f'Failed to run background write: {e}', exc_info=e)
+
+def shutdown() -> None:
+    # Wait for pending writes to complete
+    executor.shutdown(wait=True)
+
+app.session.metrics.gauge('writer.pending', lambda: executor._work_queue.qsize())
@@ -0,0 +1,80 @@
+"""
+Benchmark for broadcasting packets to many players.
+
+Compares the amount of bytes, that get encoded per broadcast, when
+encoding the packet for every recipient, with the broadcast engine,
+which encodes it once per client version.
+
+Usage: python -m benchmarks.broadcast
+"""
+
+from app.objects.collections import Players
+from app.objects.player import Player
+from app.objects import OsuClient
+from app.clients import versions
+
+import time
+import app
+
+PLAYERS = 1000
+BROADCASTS = 100
+
+class RecordingPlayer(Player):
+    def __init__(self, address: str, port: int) -> None:
+        super().__init__(address, port)
+        self.received = 0
+
+    def enqueue(self, data: bytes, key=None):
+        self.received += len(data)
+
+def create_players(amount: int) -> Players:
+    players = Players()
+    players.send_player = lambda player: None
+    dates = sorted(versions.VERSIONS.keys())
+
+    for index in range(amount):
+        date = dates[index % len(dates)]
+
+        player = RecordingPlayer('127.0.0.1', index)
+        player.id = index + 2
+        player.name = f'Player {index}'
+        player.client = OsuClient.empty()
+        player.client.version.date = date
+        player.get_client(date)
+        players.add(player)
+
+    return players
+
+def announce(player: Player) -> None:
+    player.enqueue_announcement('Server will restart in 5 minutes.')
+
+def main():
+    players = create_players(PLAYERS)
+    groups = len({(p.client.version.date, id(p.encoders)) for p in players})
+    print(f'{len(players)} players with {groups} client versions')
+
+    # Encode the packet for every player
+    start = time.perf_counter()
+
+    for _ in range(BROADCASTS):
+        for player in players:
+            announce(player)
+
+    elapsed = time.perf_counter() - start
+    encoded = sum(p.received for p in players) / BROADCASTS
+    print(f'{"per player":<12} {encoded:>12.0f} bytes/broadcast {elapsed / BROADCASTS * 1e3:>8.2f} ms/broadcast')
+
+    # Encode the packet once per client version
+    counter = app.session.metrics.counter('broadcast.encoded_bytes')
+    total = counter.total
+    start = time.perf_counter()
+
+    for _ in range(BROADCASTS):
+        players.broadcast(announce)
+
+    elapsed = time.perf_counter() - start
+    encoded = (counter.total - total) / BROADCASTS
+    print(f'{"broadcast":<12} {encoded:>12.0f} bytes/broadcast {elapsed / BROADCASTS * 1e3:>8.2f} ms/broadcast')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark for the incremental packet framer.
+
+Feeds coalesced and fragmented packet streams of increasing size into
+the framer, and compares it with the previous bytes-based parser.
+The time per packet should stay constant for the framer.
+
+Usage: python -m benchmarks.framing
+"""
+
+from app.framing import PacketFramer
+
+import random
+import struct
+import time
+
+def build_stream(count: int) -> bytes:
+    random.seed(count)
+    stream = bytearray()
+
+    for _ in range(count):
+        size = random.choice((0, 4, 32, 128, 1024))
+        stream += struct.pack('<H?I', 4, False, size)
+        stream += random.randbytes(size)
+
+    return bytes(stream)
+
+def chunks(data: bytes, size: int):
+    for index in range(0, len(data), size):
+        yield data[index:index + size]
+
+def parse_framer(data: bytes, chunk_size: int) -> int:
+    framer = PacketFramer()
+    packets = 0
+
+    for chunk in chunks(data, chunk_size):
+        framer.feed(chunk)
+
+        for _ in framer:
+            packets += 1
+
+    return packets
+
+def parse_legacy(data: bytes, chunk_size: int) -> int:
+    buffer = b""
+    packets = 0
+
+    for chunk in chunks(data, chunk_size):
+        buffer += chunk
+
+        while len(buffer) >= 7:
+            _, _, size = struct.unpack_from('<H?I', buffer)
+
+            if len(buffer) < 7 + size:
+                break
+
+            # Copy the payload and the remaining tail,
+            # like the previous implementation did
+            bytes(buffer[7:7 + size])
+            buffer = buffer[7 + size:]
+            packets += 1
+
+    return packets
+
+def measure(parser, data: bytes, chunk_size: int) -> float:
+    start = time.perf_counter()
+    parser(data, chunk_size)
+    return time.perf_counter() - start
+
+def main():
+    print(f'{"packets":>8} {"chunk":>8} {"framer ns/pkt":>14} {"legacy ns/pkt":>14}')
+
+    for count in (1_000, 10_000, 50_000):
+        data = build_stream(count)
+
+        for chunk_size in (16, 1460, len(data)):
+            framer = measure(parse_framer, data, chunk_size)
+            legacy = measure(parse_legacy, data, chunk_size)
+            label = 'all' if chunk_size == len(data) else chunk_size
+
+            print(
+                f'{count:>8} {label:>8} '
+                f'{framer / count * 1e9:>14.0f} '
+                f'{legacy / count * 1e9:>14.0f}'
+            )
+
+if __name__ == '__main__':
+    main()
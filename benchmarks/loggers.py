@@ -0,0 +1,61 @@
+"""
+Regression check for loggers, that are leaked by players.
+
+Connects 100k synthetic identities with a unique address & username,
+and checks that neither the amount of registered loggers nor the
+memory grows after they disconnect. Exits with 1 on a leak.
+
+Usage: python -m benchmarks.loggers [identities]
+"""
+
+from app.logger import ContextLogger
+from app.objects.player import Player
+from app import logger
+
+import tracemalloc
+import logging
+import gc
+import sys
+
+# Memory, that can be allocated by caches without being a leak
+TOLERANCE = 256 * 1024
+
+def connect(index: int) -> None:
+    player = Player(f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}', index)
+    player.logger.debug('Connected')
+
+    # Simulates the rename in login_received
+    player.logger = ContextLogger(logger.players, f'Player "Player {index}"')
+    player.logger.debug('Disconnected')
+
+def main():
+    identities = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    # Warm up caches of the logging module & player class
+    for index in range(1000):
+        connect(index)
+
+    gc.collect()
+    loggers = len(logging.Logger.manager.loggerDict)
+
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+
+    for index in range(identities):
+        connect(index)
+
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    growth = current - start
+    new_loggers = len(logging.Logger.manager.loggerDict) - loggers
+
+    print(f'{identities} identities, {new_loggers} new loggers, {growth / 1024:.2f} KiB retained')
+
+    if new_loggers > 0 or growth > TOLERANCE:
+        print('Loggers are leaking')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
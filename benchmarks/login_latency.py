@@ -0,0 +1,51 @@
+"""
+Login latency benchmark for a running bancho server.
+
+Logs in a set of accounts over http at the same time and reports
+the latency percentiles, measured until the login reply was received.
+Run it twice to compare the first logins with the cached credentials.
+
+Usage: python -m benchmarks.login_latency <accounts file> [url] [concurrency]
+
+The accounts file contains one "username:password" pair per line.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.workers import login, load_accounts
+from typing import List, Tuple
+
+import requests
+import time
+import sys
+
+def measure_login(url: str, account: Tuple[str, str]) -> float:
+    session = requests.Session()
+    start = time.perf_counter()
+    login(session, url, *account)
+    return time.perf_counter() - start
+
+def percentile(values: List[float], percent: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+def main():
+    accounts = load_accounts(sys.argv[1])
+    url = sys.argv[2] if len(sys.argv) > 2 else 'http://127.0.0.1:5000'
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else len(accounts)
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = list(executor.map(
+            lambda account: measure_login(url, account),
+            accounts
+        ))
+
+    print(f'{len(accounts)} logins, {concurrency} at a time')
+
+    for percent in (50, 90, 99):
+        print(f'p{percent:<4} {percentile(latencies, percent) * 1e3:>10.2f} ms')
+
+    print(f'{"max":<5} {max(latencies) * 1e3:>10.2f} ms')
+
+if __name__ == '__main__':
+    main()
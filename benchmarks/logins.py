@@ -0,0 +1,64 @@
+"""
+Benchmark for password checks during a login storm.
+
+Simulates every player reconnecting at the same time after a restart,
+by checking the passwords of many users on the worker threads.
+Compares the inline bcrypt checks with the process pool, and with the
+credential cache, which is warm when players reconnect to the same process.
+
+Usage: python -m benchmarks.logins [users] [threads]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from app import credentials
+
+import hashlib
+import bcrypt
+import time
+import sys
+
+ROUNDS = 10
+
+def create_users(amount: int) -> List[Tuple[int, str, str]]:
+    md5 = hashlib.md5(b'password').hexdigest()
+    hashed = bcrypt.hashpw(md5.encode(), bcrypt.gensalt(ROUNDS)).decode()
+
+    # Hashing is slow, so the users share the same hash
+    return [(index + 2, md5, hashed) for index in range(amount)]
+
+def inline(user_id: int, md5: str, hashed: str) -> bool:
+    return bcrypt.checkpw(md5.encode(), hashed.encode())
+
+def pooled(user_id: int, md5: str, hashed: str) -> bool:
+    return credentials.submit(user_id, md5, hashed).result()
+
+def measure(name: str, check: Callable, users: list, threads: int) -> None:
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(threads) as executor:
+        results = list(executor.map(lambda user: check(*user), users))
+
+    elapsed = time.perf_counter() - start
+    assert all(results)
+
+    print(f'{name:<24} {elapsed:>8.2f}s {len(users) / elapsed:>10.2f} logins/s')
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    users = create_users(amount)
+
+    print(f'{amount} logins on {threads} threads, bcrypt cost {ROUNDS}')
+    measure('inline', inline, users, threads)
+
+    # Start the worker processes before measuring
+    credentials.get_pool().submit(int).result()
+
+    measure('process pool (cold)', pooled, users, threads)
+    measure('credential cache (warm)', pooled, users, threads)
+    credentials.shutdown()
+
+if __name__ == '__main__':
+    main()
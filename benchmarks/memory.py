@@ -0,0 +1,60 @@
+"""
+Benchmark for the memory footprint of online players.
+
+Creates 10k players and compares the memory, that is allocated
+for their user data, when keeping a full DBUser object with its
+relationships, with the compact user snapshot.
+
+Usage: python -m benchmarks.memory
+"""
+
+from app.common.database import DBUser, DBRelationship
+from app.objects.user import UserSnapshot
+from app.objects.player import Player
+from datetime import datetime
+
+import tracemalloc
+
+PLAYERS = 10_000
+FRIENDS = 20
+
+def create_user(index: int) -> DBUser:
+    user = DBUser(
+        id=index + 2,
+        name=f'Player {index}',
+        country='DE',
+        silence_end=datetime.now(),
+        restricted=False,
+        activated=True,
+        preferred_mode=0,
+        discord_id=None,
+        is_bot=False
+    )
+    user.relationships = [
+        DBRelationship(user_id=user.id, target_id=target, status=0)
+        for target in range(FRIENDS)
+    ]
+    return user
+
+def measure(name: str, create) -> None:
+    players = [Player('127.0.0.1', index) for index in range(PLAYERS)]
+
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+
+    for index, player in enumerate(players):
+        player.object = create(index)
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = current - start
+    print(f'{name:<16} {size / 1024 / 1024:>10.2f} MiB {size / PLAYERS:>10.0f} bytes/player')
+
+def main():
+    print(f'{PLAYERS} players with {FRIENDS} friends each')
+    measure('DBUser', create_user)
+    measure('UserSnapshot', lambda index: UserSnapshot.from_user(create_user(index)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark for the memory footprint of players and matches.
+
+Creates a large amount of connected players and open matches, and
+measures the bytes that are allocated per object using tracemalloc.
+Players are created with the protocol classes of real connections,
+and the attributes that still end up in an instance dict are listed.
+
+Usage: python -m benchmarks.objects [players] [matches]
+"""
+
+from app.common.constants import GameMode
+from app.objects.multiplayer import Match
+from app.objects.channel import Channel
+from twisted.internet.address import IPv4Address
+from app.objects.player import Player
+from app.tcp import TcpBanchoProtocol
+from app.http import HttpPlayer
+
+import tracemalloc
+import sys
+
+def measure(name: str, create, amount: int) -> list:
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+
+    objects = [create(index) for index in range(amount)]
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = current - start
+    print(f'{name:<16} {size / 1024 / 1024:>10.2f} MiB {size / amount:>10.0f} bytes/object')
+    return objects
+
+def create_player(index: int) -> Player:
+    if index % 4 == 0:
+        player = HttpPlayer('127.0.0.1', index)
+    else:
+        player = TcpBanchoProtocol(IPv4Address('TCP', '127.0.0.1', index))
+
+    player.id = index + 2
+    player.name = f'Player {index}'
+    return player
+
+def create_match(index: int, host: Player) -> Match:
+    match = Match(index, f'Match {index}', '', host, -1, '', '', GameMode.Osu)
+    match.chat = Channel(f'#multi_{index}', 'Multiplayer', host.name, 1, 1, public=False)
+    return match
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    matches = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+
+    hosts = measure('players', create_player, players)
+
+    for cls in (TcpBanchoProtocol, HttpPlayer):
+        sample = next(player for player in hosts if type(player) is cls)
+        print(f'{cls.__name__:<16} dict attributes: {list(getattr(sample, "__dict__", {}))}')
+
+    measure('matches', lambda index: create_match(index, hosts[index % players]), matches)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark for lookups inside the player collection.
+
+Fills the collection with 10k players and compares the indexed
+lookups with the linear scans, that were used before.
+
+Usage: python -m benchmarks.players
+"""
+
+from app.objects.collections import Players
+from app.objects.player import Player
+from app.objects import OsuClient
+from app.http import HttpPlayer
+
+import random
+import time
+
+PLAYERS = 10_000
+LOOKUPS = 10_000
+
+def create_players(amount: int) -> Players:
+    players = Players()
+    client = OsuClient.empty()
+
+    # Skip the presence broadcast, while filling the collection
+    players.send_player = lambda player: None
+
+    for index in range(amount):
+        player = (
+            HttpPlayer('127.0.0.1', index)
+            if index % 4 == 0 else
+            Player('127.0.0.1', index)
+        )
+        player.id = index + 2
+        player.name = f'Player {index}'
+        player.client = client
+
+        if isinstance(player, HttpPlayer):
+            player.token = f'token-{index}'
+
+        players.add(player)
+
+    return players
+
+def measure(name: str, lookup, keys) -> None:
+    start = time.perf_counter()
+
+    for key in keys:
+        lookup(key)
+
+    elapsed = time.perf_counter() - start
+    print(f'{name:<24} {elapsed / len(keys) * 1e6:>10.2f} us/lookup')
+
+def main():
+    players = create_players(PLAYERS)
+
+    ids = [random.randrange(2, PLAYERS + 2) for _ in range(LOOKUPS)]
+    names = [f'player {id - 2}' for id in ids]
+    tokens = [f'token-{id - 2 - (id - 2) % 4}' for id in ids]
+
+    print(f'{len(players)} players online')
+    measure('by_id', players.by_id, ids)
+    measure('by_name', players.by_name, names)
+    measure('by_token', players.by_token, tokens)
+
+    # Previous implementation, scanning the whole collection
+    scan_ids = ids[:LOOKUPS // 100]
+    scan_names = [f'Player {id - 2}' for id in scan_ids]
+    scan_tokens = tokens[:LOOKUPS // 100]
+
+    measure('by_id (scan)', lambda id: next((p for p in players if p.id == id), None), scan_ids)
+    measure('by_name (scan)', lambda name: next((p for p in players if p.name == name), None), scan_names)
+    measure(
+        'by_token (scan)',
+        lambda token: next((p for p in {p for p in players if isinstance(p, HttpPlayer)} if p.token == token), None),
+        scan_tokens
+    )
+
+    start = time.perf_counter()
+
+    for _ in range(100):
+        for _ in players:
+            pass
+
+    print(f'{"iteration":<24} {(time.perf_counter() - start) / 100 * 1e3:>10.2f} ms/pass')
+
+if __name__ == '__main__':
+    main()
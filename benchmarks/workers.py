@@ -0,0 +1,102 @@
+"""
+Load benchmark for a running bancho server.
+
+Logs in a set of accounts over http and lets each of them send
+chat messages to #osu, measuring login and message throughput.
+Run it against the server with different values for BANCHO_PROCESSES,
+to compare how both scale with the amount of worker processes.
+
+Usage: python -m benchmarks.workers <accounts file> [url] [messages] [concurrency]
+
+The accounts file contains one "username:password" pair per line.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import requests
+import hashlib
+import struct
+import time
+import sys
+
+CLIENT = 'b20130815|0|1|0:0:0:0:0|0'
+SEND_MESSAGE = 1
+
+def string(value: str) -> bytes:
+    data = value.encode()
+    length = bytearray()
+    size = len(data)
+
+    while True:
+        byte = size & 0x7f
+        size >>= 7
+        length.append(byte | 0x80 if size else byte)
+
+        if not size:
+            break
+
+    return b'\x0b' + bytes(length) + data
+
+def message_packet(content: str) -> bytes:
+    payload = string('') + string(content) + string('#osu') + struct.pack('<i', 0)
+    return struct.pack('<H?I', SEND_MESSAGE, False, len(payload)) + payload
+
+def login(session: requests.Session, url: str, username: str, password: str) -> str:
+    md5 = hashlib.md5(password.encode()).hexdigest()
+    response = session.post(
+        url,
+        data=f'{username}\n{md5}\n{CLIENT}\n'.encode(),
+        headers={'User-Agent': 'osu!'}
+    )
+    return response.headers['cho-token']
+
+def run_client(url: str, account: Tuple[str, str], messages: int) -> Tuple[float, float]:
+    session = requests.Session()
+
+    start = time.perf_counter()
+    token = login(session, url, *account)
+    login_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    for index in range(messages):
+        session.post(
+            url,
+            data=message_packet(f'benchmark message {index}'),
+            headers={'User-Agent': 'osu!', 'osu-token': token}
+        )
+
+    return login_time, time.perf_counter() - start
+
+def load_accounts(path: str) -> List[Tuple[str, str]]:
+    with open(path) as file:
+        return [
+            tuple(line.strip().split(':', 1))
+            for line in file if ':' in line
+        ]
+
+def main():
+    accounts = load_accounts(sys.argv[1])
+    url = sys.argv[2] if len(sys.argv) > 2 else 'http://127.0.0.1:5000'
+    messages = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else len(accounts)
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(
+            lambda account: run_client(url, account, messages),
+            accounts
+        ))
+
+    elapsed = time.perf_counter() - start
+    login_times = [login_time for login_time, _ in results]
+    message_times = [message_time for _, message_time in results]
+
+    print(f'{len(accounts)} clients, {messages} messages each, {elapsed:.2f}s total')
+    print(f'{"logins":<10} {len(accounts) / max(login_times):>10.2f}/s  avg {sum(login_times) / len(login_times) * 1e3:.2f} ms')
+    print(f'{"messages":<10} {len(accounts) * messages / max(message_times):>10.2f}/s')
+
+if __name__ == '__main__':
+    main()
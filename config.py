@@ -1,4 +1,5 @@
 
+import secrets
 import dotenv
 import os
 
@@ -21,8 +22,43 @@ REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
 
 AUTOJOIN_CHANNELS = eval(os.environ.get('AUTOJOIN_CHANNELS', "['#osu', '#announce']"))
 BANCHO_WORKERS = int(os.environ.get('BANCHO_WORKERS', 15))
+PROCESSES = int(os.environ.get('BANCHO_PROCESSES', 1))
+WORKER_INDEX = int(os.environ['BANCHO_WORKER_INDEX']) if 'BANCHO_WORKER_INDEX' in os.environ else None
 TCP_PORTS = eval(os.environ.get('BANCHO_TCP_PORTS', '[13381, 13382, 13383]'))
 HTTP_PORT = int(os.environ.get('BANCHO_HTTP_PORT', 5000))
+HTTP_LONGPOLL_TIMEOUT = float(os.environ.get('BANCHO_HTTP_LONGPOLL_TIMEOUT', 0))
+
+OUTBOUND_MAX_BYTES = int(os.environ.get('BANCHO_OUTBOUND_MAX_BYTES', 1024 * 1024))
+OUTBOUND_MAX_PACKETS = int(os.environ.get('BANCHO_OUTBOUND_MAX_PACKETS', 10000))
+SLOW_CONSUMER_TIMEOUT = int(os.environ.get('BANCHO_SLOW_CONSUMER_TIMEOUT', 30))
+HTTP_OUTBOUND_LIMIT = int(os.environ.get('BANCHO_HTTP_OUTBOUND_LIMIT', 8 * 1024 * 1024))
+STATS_INTERVAL = int(os.environ.get('BANCHO_STATS_INTERVAL', 250))
+
+NODE_ID = os.environ.get('BANCHO_NODE_ID', 'anchor')
+NODES = eval(os.environ.get('BANCHO_NODES', '{}'))
+TOKEN_SECRET = os.environ.get('BANCHO_TOKEN_SECRET')
+
+if NODES and not TOKEN_SECRET:
+    raise ValueError('BANCHO_TOKEN_SECRET needs to be set to the same value on every node')
+
+TOKEN_SECRET = TOKEN_SECRET or secrets.token_hex(32)
+TOKEN_LIFETIME = int(os.environ.get('BANCHO_TOKEN_LIFETIME', 60 * 60 * 24))
+
+BCRYPT_PROCESSES = int(os.environ.get('BANCHO_BCRYPT_PROCESSES', 0))
+CREDENTIAL_CACHE_SIZE = int(os.environ.get('BANCHO_CREDENTIAL_CACHE_SIZE', 10000))
+CREDENTIAL_CACHE_TTL = int(os.environ.get('BANCHO_CREDENTIAL_CACHE_TTL', 60 * 10))
+PERMISSION_CACHE_TTL = int(os.environ.get('BANCHO_PERMISSION_CACHE_TTL', 60 * 5))
+RESUME_GRACE = int(os.environ.get('BANCHO_RESUME_GRACE', 60))
+RESUME_SECRET = os.environ.get('BANCHO_RESUME_SECRET')
+
+LOGIN_CONCURRENCY = int(os.environ.get('BANCHO_LOGIN_CONCURRENCY', 8))
+LOGIN_QUEUE_TIMEOUT = float(os.environ.get('BANCHO_LOGIN_QUEUE_TIMEOUT', 5))
+LOGIN_QUEUE_SIZE = int(os.environ.get('BANCHO_LOGIN_QUEUE_SIZE', 500))
+LOGIN_IP_RATE = float(os.environ.get('BANCHO_LOGIN_IP_RATE', 0.5))
+LOGIN_IP_BURST = int(os.environ.get('BANCHO_LOGIN_IP_BURST', 10))
+RESTART_DELAY = int(os.environ.get('BANCHO_RESTART_DELAY', 15 * 1000))
+RESTART_JITTER = int(os.environ.get('BANCHO_RESTART_JITTER', 30 * 1000))
+WRITER_THREADS = int(os.environ.get('BANCHO_WRITER_THREADS', 2))
 
 DOMAIN_NAME = os.environ.get('DOMAIN_NAME')
 
@@ -47,6 +83,7 @@ DISABLE_CLIENT_VERIFICATION = eval(os.environ.get('DISABLE_CLIENT_VERIFICATION',
 ALLOW_MULTIACCOUNTING = eval(os.environ.get('ALLOW_MULTIACCOUNTING', 'False').capitalize())
 APPROVED_MAP_REWARDS = eval(os.environ.get('APPROVED_MAP_REWARDS', 'False').capitalize())
 MAINTENANCE = eval(os.environ.get('BANCHO_MAINTENANCE', 'False').capitalize())
+MULTIPLAYER = eval(os.environ.get('BANCHO_MULTIPLAYER', 'True').capitalize())
 S3_ENABLED = eval(os.environ.get('ENABLE_S3', 'True').capitalize())
 DEBUG = eval(os.environ.get('DEBUG', 'False').capitalize())
 
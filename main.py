@@ -12,8 +12,10 @@ from app.objects.player import Player
 from app.tasks import (
     activities,
     events,
-    pings
+    pings,
+    stats
 )
+from app import workers
 
 import logging
 import config
@@ -56,13 +58,27 @@ def setup():
     app.session.bot_player = bot_player
     app.session.logger.info(f'  - {bot_player.name}')
 
+    app.session.logger.info('Starting password check processes...')
+    app.credentials.start()
+
     app.session.logger.info('Loading tasks...')
     app.session.tasks.submit(pings.ping_task)
     app.session.tasks.submit(events.event_listener)
     app.session.tasks.submit(activities.match_activity)
 
+    if config.STATS_INTERVAL > 0:
+        app.session.tasks.submit(stats.stats_task)
+
+    if app.routing.enabled():
+        app.session.tasks.submit(events.route_listener)
+
+    if config.PROCESSES <= 1:
+        reset_cache()
+
+def reset_cache():
     # Reset usercount
     usercount.set(0)
+    app.session.redis.delete('bancho:usercount')
 
     # Reset player statuses
     for key in status.get_keys():
@@ -72,21 +88,26 @@ def setup():
 def before_shutdown(*args):
     for player in app.session.players:
         # Enqueue server restart packet to all players
-        # They should reconnect after 15 seconds
-        player.enqueue_server_restart(15 * 1000)
+        # They should reconnect after a randomized delay
+        player.enqueue_server_restart(app.admission.retry_delay())
 
     reactor.callLater(0.5, reactor.stop)
 
 signal.signal(signal.SIGINT, before_shutdown)
 
 def shutdown():
+    # Allow players to resume their sessions after the restart
+    app.resume.save(app.session.players)
+
     # Reset usercount
-    usercount.set(0)
+    workers.update_usercount(0)
 
     for player in app.session.players:
         status.delete(player.id)
 
     app.session.events.submit('shutdown')
+    app.credentials.shutdown()
+    app.writer.shutdown()
     app.session.tasks.shutdown(cancel_futures=True, wait=False)
 
     def force_exit(*args):
@@ -105,16 +126,57 @@ def setup_servers():
     tcp_factory = TcpBanchoFactory()
 
     reactor.suggestThreadPoolSize(config.BANCHO_WORKERS)
-    reactor.listenTCP(config.HTTP_PORT, http_factory)
+
+    if config.WORKER_INDEX is None:
+        reactor.listenTCP(config.HTTP_PORT, http_factory)
+
+        for port in config.TCP_PORTS:
+            reactor.listenTCP(port, tcp_factory)
+
+        return
+
+    # Ports are shared with the other workers
+    workers.listen(config.HTTP_PORT, http_factory)
 
     for port in config.TCP_PORTS:
-        reactor.listenTCP(port, tcp_factory)
+        workers.listen(port, tcp_factory)
 
-def main():
+    # Requests for sessions of this worker get proxied here
+    reactor.listenTCP(
+        workers.private_port(config.WORKER_INDEX),
+        http_factory,
+        interface='127.0.0.1'
+    )
+
+def run():
     reactor.addSystemEventTrigger('before', 'startup', setup)
     reactor.addSystemEventTrigger('before', 'startup', setup_servers)
     reactor.addSystemEventTrigger('after', 'shutdown', shutdown)
     reactor.run()
 
+def run_worker(index: int):
+    workers.configure(index)
+    run()
+
+def main():
+    if config.WORKER_INDEX is not None:
+        run_worker(config.WORKER_INDEX)
+        return
+
+    if config.PROCESSES <= 1:
+        run()
+        return
+
+    if config.MULTIPLAYER:
+        # Players on different workers could not play together
+        app.session.logger.fatal(
+            'Matches are not shared between worker processes. '
+            'Set BANCHO_MULTIPLAYER=False to use BANCHO_PROCESSES.'
+        )
+        exit(1)
+
+    reset_cache()
+    workers.supervise(config.PROCESSES)
+
 if __name__ == "__main__":
     main()